@@ -274,50 +274,86 @@
 #     detect_fraud()
 
 
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
-
+# Heavy visualization, reporting and training imports (seaborn, matplotlib, plotly, fpdf,
+# sklearn estimators) are deferred to the code paths that use them, so pages that never
+# render charts or reports start fast.
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import joblib
 import os
-import tempfile
-from datetime import datetime
-from fpdf import FPDF
 import numpy as np
 import json
-import hashlib
-import shap
-import plotly.express as px
+
+from chart_data import ChartSketch
+from drift import PSI_ALERT, PSI_WARN, DriftMonitor, DriftSketch
+from engines import engine_of
+from explain import TOP_K, FraudExplainer
+from ingest import SAMPLE_ROWS, Quarantine, validate
+from instrument import SamplingProfiler, StageTimer, stage
+from model_compare import ModelComparison
+from parallel_scoring import ParallelScorer
+from registry import LiveModel, ShadowedScorer, ShadowMonitor
+from report import ReportEngine
+from results_store import EXPORT_ROWS, ResultsStore, user_key
+from score_cache import ScoreCache, ScoredRun, content_hash
+from threshold import COST_RATIO
+from user_store import UserStore
+from scoring import FEATURES, LABEL, ScoreSummary, iter_scored_chunks
 
 
 
 # --- Load Models ---
-model = joblib.load("model/fraud_model.pkl")
-scaler = joblib.load("model/scaler.pkl")
+# Loaded once per server process and shared across sessions and reruns. The live model
+# follows the registry's active version, so a promotion takes effect without a restart.
+@st.cache_resource
+def get_live_model():
+    return LiveModel()
+
+@st.cache_resource
+def get_shadow_monitor():
+    return ShadowMonitor()
+
+@st.cache_resource
+def get_score_cache():
+    return ScoreCache()
+
+@st.cache_resource
+def get_model_comparison():
+    return ModelComparison()
+
+# Worker pools load the artifacts themselves, so there is one per model version; the
+# previous version's pool is dropped once the last upload using it finishes.
+@st.cache_resource(max_entries=2)
+def get_explainer(model_path, scaler_path):
+    return FraudExplainer(model_path, scaler_path)
+
+@st.cache_resource
+def get_report_engine():
+    return ReportEngine()
+
+@st.cache_resource
+def get_drift_monitor():
+    return DriftMonitor()
+
+@st.cache_resource(max_entries=2)
+def get_parallel_scorer(model_path, scaler_path):
+    return ParallelScorer(model_path, scaler_path)
+
+@st.cache_resource
+def get_results_store():
+    return ResultsStore(HISTORY_FOLDER)
+
+@st.cache_resource
+def get_user_store():
+    return UserStore()
 
 # --- Folder Setup ---
 HISTORY_FOLDER = "history"
-USER_FILE = "users.json"
+# Scored rows kept in memory for the on-page preview, charts and model comparison.
+VIEW_ROWS = 200_000
+# Accounts that may turn on the sampling profiler (comma-separated emails).
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("FRAUD_ADMINS", "").split(",") if e.strip()}
 os.makedirs(HISTORY_FOLDER, exist_ok=True)
 
-# --- Load/Save Users ---
-def load_users():
-    if os.path.exists(USER_FILE):
-        with open(USER_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_users(users):
-    with open(USER_FILE, "w") as f:
-        json.dump(users, f)
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-
 # --- Styling ---
 st.set_page_config(page_title="Smart Fraud Detection App", layout="wide")
 st.markdown("""
@@ -363,38 +399,11 @@ body {
 # --- Session State Initialization ---
 if "auth" not in st.session_state:
     st.session_state.auth = False
-if "users" not in st.session_state:
-    st.session_state.users = load_users()
 if "email" not in st.session_state:
     st.session_state.email = ""
 if "page" not in st.session_state:
     st.session_state.page = "main"
 
-# --- PDF Report Generator ---
-class PDF(FPDF):
-    def header(self):
-        self.set_font("Arial", "B", 14)
-        self.cell(0, 10, "Fraud Detection Report", ln=True, align="C")
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Arial", "I", 8)
-        self.cell(0, 10, f"Page {self.page_no()}", align="C")
-
-def generate_pdf(df, user_email, frauds):
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"User: {user_email}", ln=True)
-    pdf.cell(200, 10, txt=f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-    pdf.cell(200, 10, txt=f"Total Rows: {len(df)}", ln=True)
-    pdf.cell(200, 10, txt=f"Frauds Detected: {frauds}", ln=True)
-    pdf.ln()
-    for i, row in df.head(10).iterrows():
-        pdf.cell(200, 10, txt=f"Amount: {row['Amount']}, Fraud_Prob: {row['Fraud_Prob']}, Prediction: {row['Prediction']}", ln=True)
-    temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    pdf.output(temp_pdf.name)
-    return temp_pdf.name
-
 # --- Pages ---
 def main_page():
     st.markdown("""
@@ -419,7 +428,7 @@ def signup_page():
     email = st.text_input("Email")
     password = st.text_input("Password", type="password")
     if st.button("Register"):
-        if email in st.session_state.users:
+        if email and get_user_store().exists(email):
             st.warning("User already exists. Please log in.")
         # elif email and password:
         #     st.session_state.users[email] = password
@@ -428,11 +437,11 @@ def signup_page():
         #     st.session_state.page = "login"
         elif email and password:
 
-            hashed_pw = hash_password(password)
-            st.session_state.users[email] = hashed_pw
-            save_users(st.session_state.users)
-            st.success("Registered! Please log in.")
-            st.session_state.page = "login"
+            if get_user_store().create(email, password):
+                st.success("Registered! Please log in.")
+                st.session_state.page = "login"
+            else:
+                st.warning("User already exists. Please log in.")
 
         else:
             st.error("All fields required.")
@@ -454,13 +463,13 @@ def login_page():
     #         st.error("User not found.")
     if st.button("Login"):
        
-       hashed_pw = hash_password(password)
-       if email in st.session_state.users and st.session_state.users[email] == hashed_pw:
+       result = get_user_store().authenticate(email, password)
+       if result == "ok":
 
          st.success("Login successful.")
          st.session_state.auth = True
          st.session_state.email = email
-       elif email in st.session_state.users:
+       elif result == "invalid":
  
          st.error("Invalid password.")
        else:
@@ -479,20 +488,106 @@ def about_page():
     if st.button("⬅️ Back"):
         st.session_state.page = "main"
 
-def detect_fraud():
+def keep_run(cache, key, run):
+    # A run over the shared budget moves its per-row arrays to disk and is cached by what stays
+    # in memory; if even that does not fit, it is not kept and the next render scores it again.
+    if not cache.put(key, run) and not run.spilled:
+        run.spill()
+        cache.put(key, run)
+
+def score_upload(uploaded_file, deployment, threshold, timer=None):
+    # Stream the upload chunk by chunk: score, append to the results store, keep only a bounded view in memory
+    model, scaler, model_version = deployment.model, deployment.scaler, deployment.version
+    writer = get_results_store().start_run(
+        st.session_state.email, source=uploaded_file.name, threshold=threshold, model_version=model_version
+    )
+    scorer = get_parallel_scorer(deployment.model_path, deployment.scaler_path)
+    # A registered candidate re-scores every chunk in the background for comparison.
+    candidate = get_live_model().candidate()
+    if candidate is not None:
+        scorer = ShadowedScorer(get_shadow_monitor(), model_version, candidate, threshold, scorer)
+    summary = ScoreSummary()
+    quarantine = Quarantine()
+    sketch = DriftSketch(scaler.mean_, scaler.scale_)
+    charts = ChartSketch()
+    view_chunks, view_rows, probas, labels = [], 0, [], []
+    progress = st.progress(0.0, text="Scoring transactions...")
+    try:
+        for scored, proba in iter_scored_chunks(uploaded_file, model, scaler, threshold,
+                                                quarantine=quarantine, timer=timer, scorer=scorer):
+            with stage(timer, "store", len(scored)):
+                writer.write(scored)
+            with stage(timer, "summaries", len(scored)):
+                summary.update(scored, proba)
+                sketch.update(scored[FEATURES].to_numpy(), proba)
+                charts.update(scored, proba)
+            probas.append(proba.astype(np.float32))
+            if LABEL in scored:
+                # Missing labels become -1, which the threshold curve treats as unknown.
+                labels.append(scored[LABEL].to_numpy(dtype=np.int8, na_value=-1))
+            if view_rows < VIEW_ROWS:
+                view_chunks.append(scored.iloc[:VIEW_ROWS - view_rows])
+                view_rows += len(view_chunks[-1])
+            done = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+            progress.progress(done, text=f"Scored {summary.rows:,} rows · {summary.frauds:,} frauds so far")
+    except Exception:
+        writer.abort()
+        raise
+    progress.empty()
+
+    if not summary.rows:
+        writer.abort()
+        return None
+    with stage(timer, "store") as record:
+        writer.close()
+        record["bytes"] = os.path.getsize(writer.path)
+    get_drift_monitor().record(sketch, run_id=writer.run_id, model_version=model_version)
+    view = pd.concat(view_chunks, ignore_index=True)
+    labels = np.concatenate(labels) if len(labels) == len(probas) else None
+    return ScoredRun(np.concatenate(probas), view, summary, writer.path, labels, quarantine, charts)
+
+def drift_page():
+    st.markdown("<div class='header'><h2>📈 Drift Monitor</h2></div>", unsafe_allow_html=True)
+    if st.button("⬅️ Back"):
+        st.session_state.page = "main"
+    runs = get_drift_monitor().history()
+    if not runs:
+        st.info("No scored runs yet. Drift is tracked for every upload from now on.")
+        return
+
+    st.caption(f"Feature PSI compares each run with the training data; score PSI compares it with all earlier runs. "
+               f"PSI ≥ {PSI_WARN} is worth a look, ≥ {PSI_ALERT} is a significant shift.")
+    trend = pd.DataFrame({
+        "Max feature PSI": [r["max_feature_psi"] for r in runs],
+        "Fraud_Prob PSI": [r["score"]["psi"] if r["score"] else None for r in runs],
+    }, index=pd.to_datetime([r["created"] for r in runs]))
+    st.line_chart(trend)
+
+    latest = runs[-1]
+    st.subheader(f"Latest run · {latest['created']} · {latest['rows']:,} rows · {latest['level'].upper()}")
+    features = pd.DataFrame(latest["features"]).T.sort_values("psi", ascending=False)
+    features["status"] = [("🔴" if v >= PSI_ALERT else "🟡" if v >= PSI_WARN else "🟢") for v in features["psi"]]
+    st.dataframe(features)
+    st.download_button("Download Drift Log (JSON)", json.dumps(runs), file_name="drift.json")
+
+    shadow = get_shadow_monitor().snapshot()
+    if shadow:
+        st.subheader("🕶️ Shadow Scoring")
+        st.caption("Candidate model re-scoring the active model's uploads in this server process. "
+                   "Latency is per scored chunk.")
+        st.dataframe(pd.json_normalize(shadow))
+
+def detect_fraud(timer):
+    # One deployment for the whole render, even if a new version is promoted meanwhile.
+    deployment = get_live_model().current()
+    model, scaler, model_version = deployment.model, deployment.scaler, deployment.version
     st.markdown("<div class='header'><h2>Detect Fraud</h2></div>", unsafe_allow_html=True)
     st.markdown(f"### 👤 Welcome, `{st.session_state.email}`")
+    st.caption(f"Model version `{model_version}` · engine `{engine_of(model)}`")
 
     if st.button("🚪 Logout"):
-        # Delete user's history files
-        for file in os.listdir(HISTORY_FOLDER):
-            if file.startswith(st.session_state.email):
-                os.remove(os.path.join(HISTORY_FOLDER, file))
-
-        # Delete user credentials
-        if st.session_state.email in st.session_state.users:
-            del st.session_state.users[st.session_state.email]
-            save_users(st.session_state.users)
+        # Delete user's history
+        get_results_store().delete_user(st.session_state.email)
 
         # Clear session state
         st.session_state.auth = False
@@ -504,70 +599,151 @@ def detect_fraud():
     col1, col2, col3 = st.columns(3)
     # rest of the code continues...
 
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
        if st.button("⬅️ Back"):
             st.session_state.auth = False
             st.session_state.page = "main"
     with col2:
         if st.button("Previous History"):
-            history_files = sorted([
-                f for f in os.listdir(HISTORY_FOLDER) if f.startswith(st.session_state.email)
-            ], reverse=True)
-            if not history_files:
+            store = get_results_store()
+            runs = store.list_runs(st.session_state.email)
+            if not runs:
                 st.info("No history files found.")
             else:
-                selected_file = st.selectbox("Select a file to view", history_files)
-                file_path = os.path.join(HISTORY_FOLDER, selected_file)
-                df_prev = pd.read_csv(file_path)
-                st.dataframe(df_prev.head(20))
-                with open(file_path, "rb") as f:
-                    st.download_button("Download Selected CSV", f.read(), file_name=selected_file)
+                selected = st.selectbox(
+                    "Select a file to view", runs,
+                    format_func=lambda r: f"{r['created']} · {r.get('source', '')} · {r['frauds']:,}/{r['rows']:,} frauds",
+                )
+                st.dataframe(store.preview(st.session_state.email, selected["run_id"], n=20))
+                st.download_button(
+                    "Download Selected CSV",
+                    lambda: store.to_csv(st.session_state.email, selected["run_id"]),
+                    file_name=f"fraud_results_{selected['run_id']}.csv",
+                    mime="text/csv",
+                )
+                if selected["rows"] > EXPORT_ROWS:
+                    st.caption(f"The download holds the first {EXPORT_ROWS:,} of {selected['rows']:,} rows.")
     with col3:
         if st.button("Clear History"):
-            for file in os.listdir(HISTORY_FOLDER):
-                if file.startswith(st.session_state.email):
-                    os.remove(os.path.join(HISTORY_FOLDER, file))
+            get_results_store().delete_user(st.session_state.email)
             st.success("History cleared!")
+    with col4:
+        if st.button("📈 Drift Monitor"):
+            st.session_state.page = "drift"
 
-    uploaded_file = st.file_uploader("📁 Upload CSV File", type="csv")
+    uploaded_file = st.file_uploader("📁 Upload Transactions (CSV, gzip/zstd CSV or Parquet)",
+                                     type=["csv", "gz", "zst", "parquet"])
     threshold = st.slider("⚙️ Prediction Threshold", 0.0, 1.0, 0.5, 0.01)
 
     if uploaded_file:
-        df = pd.read_csv(uploaded_file)
-        if "Class" in df.columns:
-            df.drop("Class", axis=1, inplace=True)
-
-        expected = ['Time'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
-        if not all(col in df.columns for col in expected):
-            st.error("Missing required columns.")
+        # Header and a sample of rows are checked before the full parse
+        with timer.stage("validate", SAMPLE_ROWS):
+            check = validate(uploaded_file)
+        if check.error:
+            st.error(check.error)
+            return
+        if check.missing:
+            st.error(f"Missing required columns: {', '.join(check.missing)}")
+            return
+        if check.unreadable:
+            st.error(f"None of the first {check.sample_rows:,} rows have numeric values for every feature. "
+                     "Please check the file.")
             return
 
-        df = df[expected]
-        X_scaled = scaler.transform(df)
-        proba = model.predict_proba(X_scaled)[:, 1]
-        prediction = (proba >= threshold).astype(int)
-
-        df["Prediction"] = prediction
-        df["Fraud_Prob"] = proba.round(4)
-        frauds = sum(prediction)
-
-        st.success(f"✅ Frauds detected: {frauds} / {len(prediction)}")
+        # Scores are cached per (user, upload content, model version); a threshold change only re-labels.
+        # Each user's run has its own results file and history entry, so users never share one.
+        cache = get_score_cache()
+        with timer.stage("hash") as record:
+            key = (user_key(st.session_state.email), content_hash(uploaded_file), model_version)
+            record["bytes"] = uploaded_file.size
+        run = cache.get(key)
+        if run is None or not os.path.exists(run.results_file):
+            run = score_upload(uploaded_file, deployment, threshold, timer)
+            if run is None:
+                st.error("Uploaded file has no transactions.")
+                return
+            keep_run(cache, key, run)
+
+        timer.mark()
+        df = run.view_at(threshold)
+        frauds = run.frauds(threshold)
+        timer.lap("relabel", len(df))
+
+        st.success(f"✅ Frauds detected: {frauds} / {run.rows}")
+        if run.quarantine.rows:
+            bad = run.quarantine.to_frame()
+            st.warning(f"⚠️ {run.quarantine.rows:,} row(s) were skipped because of missing or non-numeric values.")
+            with st.expander("🚧 Quarantined rows"):
+                st.dataframe(bad[["Line", "Reason"] + FEATURES].head(100))
+                st.download_button("Download Quarantined Rows", bad.to_csv(index=False), file_name="quarantine.csv")
         st.dataframe(df.head())
+        if run.rows > len(df):
+            st.caption(f"Charts cover all {run.rows:,} rows. The preview, explanations and model comparison "
+                       f"use the first {len(df):,}; the full results are in the CSV.")
 
-        suggested_thresh = round(np.percentile(proba, 95), 2)
-        st.info(f"💡 Try using threshold ≈ {suggested_thresh} for fewer false positives.")
-
-        # Save CSV + PDF
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filename = f"{HISTORY_FOLDER}/{st.session_state.email}_{timestamp}.csv"
-        df.to_csv(filename, index=False)
+        # --- Threshold Analysis ---
+        # Answered from the run's sorted scores by binary search; nothing is re-scored.
+        import plotly.graph_objects as go
 
-        st.download_button("⬇️ Download CSV", df.to_csv(index=False), file_name="fraud_results.csv")
-
-        pdf_path = generate_pdf(df, st.session_state.email, frauds)
-        with open(pdf_path, "rb") as f:
-            st.download_button("⬇️ Download PDF Report", f.read(), file_name="fraud_report.pdf")
+        curve = run.curve
+        st.subheader("🎯 Threshold Analysis")
+        col1, col2 = st.columns(2)
+        with col1:
+            budget = st.number_input("🔔 Alert budget (max flagged rows)", min_value=1, max_value=run.rows,
+                                     value=max(run.rows // 100, 1), step=1)
+            st.info(f"💡 Threshold ≈ {curve.for_alert_budget(budget):.4f} keeps alerts within {budget:,}.")
+        with col2:
+            cost_ratio = st.number_input("💸 Cost of a missed fraud vs. a false alarm", min_value=0.1,
+                                         value=COST_RATIO, step=1.0)
+            if curve.labeled:
+                st.info(f"💡 Threshold ≈ {curve.for_cost_ratio(cost_ratio):.4f} minimises total cost.")
+            else:
+                st.caption(f"Include a `{LABEL}` column in the upload for precision, recall and cost.")
+
+        at = curve.metrics(threshold, cost_ratio)
+        cols = st.columns(4 if curve.labeled else 1)
+        cols[0].metric("Flagged", f"{at['flagged']:,}", f"{at['alert_rate']:.2%} of rows", delta_color="off")
+        if curve.labeled:
+            cols[1].metric("Precision", f"{float(at['precision']):.3f}")
+            cols[2].metric("Recall", f"{float(at['recall']):.3f}")
+            cols[3].metric("Cost", f"{float(at['cost']):,.0f}", f"{int(at['fp']):,} FP · {int(at['fn']):,} FN",
+                           delta_color="off")
+
+        grid = curve.curve()
+        fig0 = go.Figure()
+        fig0.add_trace(go.Scatter(x=grid["threshold"], y=grid["alert_rate"], name="Alert rate"))
+        if curve.labeled:
+            fig0.add_trace(go.Scatter(x=grid["threshold"], y=grid["precision"], name="Precision"))
+            fig0.add_trace(go.Scatter(x=grid["threshold"], y=grid["recall"], name="Recall"))
+        fig0.add_vline(x=threshold, line_dash="dash", line_color="red")
+        fig0.update_layout(xaxis_title="Threshold", yaxis_title="Rate", yaxis_range=[0, 1.02], height=350)
+        st.plotly_chart(fig0)
+        timer.lap("threshold_analysis", run.rows)
+
+        # --- Explanations for Flagged Rows ---
+        flagged = get_explainer(deployment.model_path, deployment.scaler_path).explain_flagged(df, model_version)
+        st.subheader("🧾 Why were these transactions flagged?")
+        if flagged.empty:
+            st.info("No transactions above the threshold.")
+        else:
+            st.dataframe(flagged[["Time", "Amount", "Fraud_Prob", "Prediction", "Top_Features"]])
+            st.caption(f"SHAP attributions toward fraud for the {len(flagged):,} highest-probability flagged rows "
+                       f"(top {TOP_K} V features).")
+        timer.lap("explain", len(flagged))
+
+        # Download CSV (written from the stored run to a temporary file on click, capped) + PDF
+        st.download_button("⬇️ Download CSV", timer.deferred("csv_export", lambda: run.to_csv(threshold)),
+                           file_name="fraud_results.csv", mime="text/csv")
+        if run.rows > EXPORT_ROWS:
+            st.caption(f"The CSV holds the first {EXPORT_ROWS:,} of {run.rows:,} rows. "
+                       "Score the full file with `python score.py` for complete results.")
+
+        # The report renders in the background from the run's aggregates; the click only waits on it
+        report = get_report_engine().submit(key, run.summary, st.session_state.email, threshold, flagged,
+                                            timer.request_id)
+        st.download_button("⬇️ Download PDF Report", lambda: report.result(), file_name="fraud_report.pdf",
+                           mime="application/pdf")
         st.markdown("""
 <div style="margin-top: 30px;">
     <h4>📤 Share Your Report</h4>
@@ -584,66 +760,109 @@ def detect_fraud():
 
 
         # --- Visual Insights ---
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Charts are drawn from small precomputed summaries, memoized per run and threshold
+        timer.mark()
+        memoized = len(run.charts)
+        charts = run.chart_data(threshold)
+        if len(run.charts) != memoized:
+            keep_run(cache, key, run)
+        timer.lap("chart_data", run.rows)
+        colors = {0: "green", 1: "red"}
+        names = {0: "Legit", 1: "Fraud"}
+
         st.subheader("📊 Visual Insights")
         col1, col2 = st.columns(2)
         with col1:
-            pie_data = df["Prediction"].value_counts().sort_index()
-            labels = ["Legit", "Fraud"][:len(pie_data)]
+            pie_data = {k: c for k, c in enumerate((run.rows - frauds, frauds)) if c}
             fig1, ax1 = plt.subplots()
-            ax1.pie(pie_data, labels=labels, autopct="%1.1f%%", colors=["green", "red"])
+            ax1.pie(list(pie_data.values()), labels=[names[k] for k in pie_data], autopct="%1.1f%%",
+                    colors=[colors[k] for k in pie_data])
             ax1.axis("equal")
             st.pyplot(fig1)
+            timer.lap("chart_pie")
         with col2:
             fig2, ax2 = plt.subplots()
-            sns.histplot(df[df["Prediction"] == 0]["Amount"], color="green", label="Legit", kde=True)
-            sns.histplot(df[df["Prediction"] == 1]["Amount"], color="red", label="Fraud", kde=True)
+            centers = (charts.amount_edges[:-1] + charts.amount_edges[1:]) / 2
+            for k in (0, 1):
+                if charts.amount_hist[:, k].sum():
+                    sns.histplot(x=centers, weights=charts.amount_hist[:, k], bins=list(charts.amount_edges),
+                                 color=colors[k], label=names[k], kde=True, ax=ax2)
             ax2.set_title("Amount Distribution")
+            ax2.set_xlabel("Amount")
             plt.legend()
             st.pyplot(fig2)
+            timer.lap("chart_amount")
         # --- Additional Graphs ---
 # Heatmap
         fig3, ax3 = plt.subplots(figsize=(10, 8))
-        sns.heatmap(df.corr(), cmap='coolwarm', ax=ax3)
+        sns.heatmap(charts.corr, cmap='coolwarm', ax=ax3)
         ax3.set_title("🔍 Feature Correlation Heatmap")
         st.pyplot(fig3)
+        timer.lap("chart_heatmap")
 
        # Hourly Fraud Pattern
-        df["Hour"] = (df["Time"] // 3600) % 24
+        hourly = pd.DataFrame({
+            "Hour": np.repeat(np.arange(24), 2),
+            "Prediction": np.tile([0, 1], 24),
+            "count": charts.hourly.ravel(),
+        })
         fig4, ax4 = plt.subplots(figsize=(10, 6))
-        sns.countplot(x="Hour", hue="Prediction", data=df, palette={0: "green", 1: "red"}, ax=ax4)
+        sns.barplot(x="Hour", y="count", hue="Prediction", data=hourly, palette=colors, ax=ax4)
         ax4.set_title("🕒 Hourly Fraud Pattern")
         st.pyplot(fig4)
+        timer.lap("chart_hourly")
 
 # Log Amount Distribution
-        df["log_amount"] = df["Amount"].apply(lambda x: np.log1p(x))
         fig5, ax5 = plt.subplots(figsize=(10, 6))
-        sns.kdeplot(data=df, x="log_amount", hue="Prediction", fill=True, common_norm=False, palette={0: "green", 1: "red"}, ax=ax5)
+        sns.kdeplot(data=charts.sample, x="log_amount", hue="Prediction", fill=True, common_norm=False, palette=colors, ax=ax5)
         ax5.set_title("💰 Log Amount Distribution by Class")
         st.pyplot(fig5)
+        timer.lap("chart_log_amount")
         st.subheader("📊 Interactive Dashboard (Plotly)")
 
-        # Interactive Fraud vs. Legit over Time
-        fig6 = px.scatter(
-            df.head(1000),  # limit to 1000 rows for speed
-            x="Time",
-            y="Amount",
-            color=df["Prediction"].map({0: "Legit", 1: "Fraud"}),
-            title="Fraud vs Legit Transactions Over Time",
-            labels={"color": "Class"},
-            hover_data=["Fraud_Prob"]
-        )
+        dash = charts.dashboard
+
+        # Interactive Fraud vs. Legit over Time (WebGL; legit rows density-binned on large uploads)
+        fig6 = go.Figure()
+        if dash.legit_density is not None:
+            counts, x_edges, y_edges = dash.legit_density
+            fig6.add_trace(go.Heatmap(
+                x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+                z=np.log1p(counts), customdata=counts, colorscale="Greens", showscale=False,
+                name="Legit (density)", hovertemplate="Time %{x:.0f}<br>Amount %{y:.2f}<br>Legit: %{customdata:.0f}<extra></extra>",
+            ))
+        elif dash.legit_points is not None:
+            fig6.add_trace(go.Scattergl(
+                x=dash.legit_points["Time"], y=dash.legit_points["Amount"], mode="markers",
+                marker=dict(color="green", size=4), name="Legit", customdata=dash.legit_points["Fraud_Prob"],
+                hovertemplate="Time %{x:.0f}<br>Amount %{y:.2f}<br>Fraud_Prob %{customdata}<extra></extra>",
+            ))
+        fig6.add_trace(go.Scattergl(
+            x=dash.fraud_points["Time"], y=dash.fraud_points["Amount"], mode="markers",
+            marker=dict(color="red", size=5), name="Fraud", customdata=dash.fraud_points["Fraud_Prob"],
+            hovertemplate="Time %{x:.0f}<br>Amount %{y:.2f}<br>Fraud_Prob %{customdata}<extra></extra>",
+        ))
+        fig6.update_layout(title="Fraud vs Legit Transactions Over Time", xaxis_title="Time", yaxis_title="Amount",
+                           legend_title="Class")
         st.plotly_chart(fig6)
-
-        # Interactive Boxplot for Amount by Class
-        fig7 = px.box(
-            df.head(1000),
-            x=df["Prediction"].map({0: "Legit", 1: "Fraud"}),
-            y="Amount",
-            color=df["Prediction"].map({0: "Legit", 1: "Fraud"}),
-            title="Amount Distribution by Class (Legit vs Fraud)",
-            labels={"x": "Class"}
-        )
+        timer.lap("chart_scatter")
+
+        # Interactive Boxplot for Amount by Class (from precomputed quartiles)
+        fig7 = go.Figure()
+        for k, color in colors.items():
+            stats = dash.amount_box[k]
+            if stats:
+                fig7.add_trace(go.Box(
+                    x=[names[k]], q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+                    lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]],
+                    name=names[k], marker_color=color,
+                ))
+        fig7.update_layout(title="Amount Distribution by Class (Legit vs Fraud)", xaxis_title="Class", yaxis_title="Amount")
         st.plotly_chart(fig7)
+        timer.lap("chart_box")
 
 
 
@@ -672,53 +891,69 @@ def detect_fraud():
             # Scale input using previously saved scaler
             input_scaled = scaler.transform(input_data)
 
-            # Predict
+            # Predict: one predict_proba call, label derived from the threshold slider
             proba = model.predict_proba(input_scaled)[0][1]
-            prediction = model.predict(input_scaled)[0]
+            prediction = int(proba >= threshold)
 
             result = "🚨 Fraud" if prediction == 1 else "✅ Legit"
             st.success(f"**Prediction:** {result}")
             st.info(f"**Fraud Probability:** {proba:.4f}")
 
             st.markdown("<div class='header'><h2>⚖️ Model Comparison</h2></div>", unsafe_allow_html=True)
-        st.info("Compare Logistic Regression and Random Forest on your uploaded data.")
-
-        if st.button("Compare Models"):
-            X = df.drop(["Prediction", "Fraud_Prob"], axis=1)
-            y = prediction  # Use the prediction labels already made by the base model
-
-            results = {}
-
-            # Logistic Regression
-            log_model = LogisticRegression(max_iter=1000)
-            log_model.fit(X_scaled, y)
-            y_pred_log = log_model.predict(X_scaled)
-            results["Logistic Regression"] = {
-                "accuracy": accuracy_score(y, y_pred_log),
-                "conf_matrix": confusion_matrix(y, y_pred_log),
-                "report": classification_report(y, y_pred_log, output_dict=True)
-            }
-
-            # Random Forest
-            rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
-            rf_model.fit(X_scaled, y)
-            y_pred_rf = rf_model.predict(X_scaled)
-            results["Random Forest"] = {
-                "accuracy": accuracy_score(y, y_pred_rf),
-                "conf_matrix": confusion_matrix(y, y_pred_rf),
-                "report": classification_report(y, y_pred_rf, output_dict=True)
-            }
-
-            # Display results
-            for model_name, res in results.items():
-                st.subheader(f"📘 {model_name}")
-                st.write(f"Accuracy: {res['accuracy']:.4f}")
-                st.write("Confusion Matrix:")
-                st.write(res["conf_matrix"])
-                st.write("Classification Report:")
-                st.json(res["report"])
-
-
+        # Candidates are scored against the true labels, so the comparison needs a Class
+        # column holding both classes; the base model's own predictions are no ground truth.
+        # Rows whose label is missing are scored above but left out of the comparison.
+        labeled = LABEL in df and df[LABEL].nunique() > 1
+        if labeled:
+            st.info("Compare Logistic Regression, Random Forest and Histogram Gradient Boosting "
+                    f"on your uploaded data, evaluated against its `{LABEL}` labels.")
+        else:
+            st.info(f"Include a `{LABEL}` column with both fraud and legit rows in the upload "
+                    "to compare models against true labels.")
+
+        if st.button("Compare Models", disabled=not labeled):
+            known = df[df[LABEL].notna()]
+            X_scaled = scaler.transform(known[FEATURES])
+            y = known[LABEL].to_numpy(dtype=np.int8)
+
+            # Candidates fit concurrently in worker processes on the earliest 70% (by Time)
+            # and are evaluated on the latest 30%; results stream in as each finishes.
+            progress = st.progress(0.0, text="Fitting candidate models...")
+            results = []
+            for done, total, res in get_model_comparison().run(X_scaled, y, known["Time"].to_numpy()):
+                results.append(res)
+                progress.progress(done / total, text=f"Finished {res['name']} ({done}/{total})")
+                with st.container():
+                    st.subheader(f"📘 {res['name']}" + (" (cached)" if res["cached"] else ""))
+                    c1, c2, c3, c4, c5 = st.columns(5)
+                    c1.metric("Accuracy", f"{res['accuracy']:.4f}")
+                    c2.metric("AUC-PR", "n/a" if res["auc_pr"] is None else f"{res['auc_pr']:.4f}")
+                    c3.metric("Train time", f"{res['train_seconds']:.2f} s")
+                    c4.metric("Inference", f"{res['rows_per_sec']:,.0f} rows/s")
+                    c5.metric("Model size", f"{res['model_bytes'] / 2**20:.2f} MB")
+                    st.write("Confusion Matrix:")
+                    st.write(np.array(res["conf_matrix"]))
+                    st.write("Classification Report:")
+                    st.json(res["report"])
+            progress.empty()
+            st.caption(f"Trained on {results[0]['train_rows']:,} earlier rows, evaluated on {results[0]['test_rows']:,} later rows.")
+
+
+
+# --- Timing Panel ---
+def timing_panel(timer, profiler=None):
+    rows = timer.rows()
+    with st.expander(f"⏱️ Timings · {timer.total_seconds:.2f}s · request {timer.request_id}"):
+        if rows:
+            timings = pd.DataFrame(rows).set_index("stage")
+            timings["ms"] = (timings.pop("seconds") * 1000).round(1)
+            st.dataframe(timings[["ms", "rows", "bytes", "calls"]])
+        else:
+            st.caption("No instrumented stages ran on this page.")
+        if profiler is not None:
+            path = profiler.save(timer.request_id)
+            st.caption(f"Sampling profiler: {profiler.total:,} samples · collapsed stacks saved to `{path}`")
+            st.dataframe(pd.DataFrame(profiler.top(), columns=["function", "self %", "total %"]).round(1))
 
 # --- Page Routing ---
 if not st.session_state.auth:
@@ -731,4 +966,18 @@ if not st.session_state.auth:
     elif st.session_state.page == "about":
         about_page()
 else:
-    detect_fraud()
+    # Every signed-in render is timed per stage and logged; admins can also sample it.
+    timer = StageTimer(st.session_state.page, user_key(st.session_state.email))
+    profiler = None
+    if st.session_state.email.strip().lower() in ADMIN_EMAILS and st.sidebar.toggle("🧪 Sampling profiler"):
+        profiler = SamplingProfiler().start()
+    try:
+        if st.session_state.page == "drift":
+            drift_page()
+        else:
+            detect_fraud(timer)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        timer.flush()
+    timing_panel(timer, profiler)
@@ -0,0 +1,312 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engines import DEFAULT_ENGINE, ENGINES, single_threaded
+from scoring import FEATURES, LABEL
+
+# --- Benchmark Suite ---
+# Synthetic transactions in the 30-column schema, a model trained on them, then each hot
+# path timed in its own fresh process so peak memory is attributable to a single stage.
+# Runs offline on CPU only; results are written as JSON for comparison across commits.
+# With several --engines every stage runs once per model engine on the same data, so fit
+# time, throughput and peak memory line up side by side.
+STAGES = ["train", "fit", "parse", "score", "pipeline", "single_row", "threshold", "charts", "report"]
+# Fraud rows are shifted along a few components, like the real PCA features.
+FRAUD_SHIFT = {"V4": 2.5, "V10": -3.0, "V12": -3.5, "V14": -4.0, "V17": -3.0}
+SINGLE_ROW_CALLS = 200
+
+
+def synthetic_transactions(rows, fraud_ratio, seed=0):
+    rng = np.random.default_rng(seed)
+    fraud = rng.random(rows) < fraud_ratio
+    data = {"Time": np.sort(rng.uniform(0, 172_800, rows)).astype(np.float32)}
+    for i in range(1, 29):
+        col = f"V{i}"
+        values = rng.normal(size=rows)
+        values[fraud] += FRAUD_SHIFT.get(col, 0.0)
+        data[col] = values.astype(np.float32)
+    data["Amount"] = np.round(rng.lognormal(3.0, 1.3, rows), 2).astype(np.float32)
+    data[LABEL] = fraud.astype(np.int8)
+    return pd.DataFrame(data)
+
+
+def _peak_mb():
+    # ru_maxrss is in KB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# --- Stages ---
+# Each returns (callable to time, rows it processes); setup work is excluded from the timing.
+def _artifacts():
+    from scoring import load_artifacts
+
+    model, scaler = load_artifacts()
+    single_threaded(model)
+    return model, scaler
+
+
+def stage_train(ctx):
+    from train_model import train_streaming
+
+    args = argparse.Namespace(data=ctx["csv"], engine=ctx["engine"], n_estimators=ctx["trees"], max_depth=12,
+                              learning_rate=0.1, streaming=True, chunksize=100_000, max_memory_mb=1024,
+                              neg_ratio=5.0, test_size=0.3, max_eval_rows=1_000_000, n_jobs=1)
+    return lambda: train_streaming(args), ctx["rows"]
+
+
+def stage_fit(ctx):
+    # The model fit alone, on every row and without resampling; train also times the CSV passes.
+    from engines import make_model
+    from train_model import engine_params
+
+    df = pd.read_csv(ctx["csv"])
+    X, y = df[FEATURES].to_numpy(), df[LABEL].to_numpy()
+    args = argparse.Namespace(engine=ctx["engine"], n_estimators=ctx["trees"], max_depth=12, learning_rate=0.1)
+    model = make_model(ctx["engine"], engine_params(args))
+    return lambda: {"model_mb": len(pickle.dumps(model.fit(X, y))) / 2**20}, ctx["rows"]
+
+
+def stage_parse(ctx):
+    from ingest import iter_chunks
+
+    def run():
+        for _ in iter_chunks(ctx["csv"]):
+            pass
+        return {"bytes_read": os.path.getsize(ctx["csv"])}
+    return run, ctx["rows"]
+
+
+def stage_score(ctx):
+    from ingest import iter_chunks
+    from scoring import score_frame
+
+    model, scaler = _artifacts()
+    chunks = list(iter_chunks(ctx["csv"]))
+
+    def run():
+        for chunk in chunks:
+            score_frame(chunk, model, scaler, 0.5)
+    return run, ctx["rows"]
+
+
+def stage_pipeline(ctx):
+    # The upload path without Streamlit: parse, score, store, running totals, drift, chart summaries
+    # and threshold curve.
+    from chart_data import ChartSketch
+    from drift import DriftSketch
+    from results_store import ResultsStore
+    from scoring import ScoreSummary, iter_scored_chunks
+    from threshold import ThresholdCurve
+
+    model, scaler = _artifacts()
+    store = ResultsStore(os.path.join(ctx["workdir"], "history"))
+
+    def run():
+        writer = store.start_run("bench@example.com")
+        summary, sketch, probas, labels = ScoreSummary(), DriftSketch(scaler.mean_, scaler.scale_), [], []
+        charts = ChartSketch()
+        for scored, proba in iter_scored_chunks(ctx["csv"], model, scaler, 0.5):
+            writer.write(scored)
+            summary.update(scored, proba)
+            sketch.update(scored[FEATURES].to_numpy(), proba)
+            charts.update(scored, proba)
+            probas.append(proba.astype(np.float32))
+            labels.append(scored[LABEL].to_numpy(dtype=np.int8, na_value=-1))
+        writer.close()
+        ThresholdCurve(np.concatenate(probas), np.concatenate(labels))
+        return {"bytes_written": os.path.getsize(writer.path)}
+    return run, ctx["rows"]
+
+
+def stage_single_row(ctx):
+    # The manual-form path: one-row DataFrame, scaler.transform, predict_proba.
+    model, scaler = _artifacts()
+    row = synthetic_transactions(1, 0.0, ctx["seed"])[FEATURES]
+    latencies = []
+
+    def run():
+        for _ in range(SINGLE_ROW_CALLS):
+            start = time.perf_counter()
+            model.predict_proba(scaler.transform(row))[0][1]
+            latencies.append((time.perf_counter() - start) * 1000)
+        return {"p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99))}
+    return run, SINGLE_ROW_CALLS
+
+
+def _scored(ctx):
+    from ingest import iter_chunks
+    from scoring import ScoreSummary, score_frame
+
+    model, scaler = _artifacts()
+    frames, probas, summary = [], [], ScoreSummary()
+    for chunk in iter_chunks(ctx["csv"]):
+        scored, proba = score_frame(chunk, model, scaler, 0.5)
+        summary.update(scored, proba)
+        frames.append(scored)
+        probas.append(proba)
+    return pd.concat(frames, ignore_index=True), np.concatenate(probas), summary
+
+
+def stage_threshold(ctx):
+    from threshold import ThresholdCurve
+
+    df, proba, _ = _scored(ctx)
+    labels = df[LABEL].to_numpy(dtype=np.int8, na_value=-1)
+
+    def run():
+        curve = ThresholdCurve(proba, labels)
+        for t in np.linspace(0, 1, 1000):
+            curve.metrics(t)
+        curve.for_cost_ratio()
+    return run, ctx["rows"]
+
+
+def stage_charts(ctx):
+    # One redraw at a new threshold, from the whole-run summaries built while scoring.
+    from chart_data import ChartSketch
+    from scoring import CHUNK_SIZE
+
+    df, proba, summary = _scored(ctx)
+    sketch = ChartSketch()
+    for start in range(0, len(df), CHUNK_SIZE):
+        sketch.update(df.iloc[start:start + CHUNK_SIZE], proba[start:start + CHUNK_SIZE])
+    return lambda: sketch.chart_data(0.5, summary.by_hour(0.5)), ctx["rows"]
+
+
+def stage_report(ctx):
+    import importlib
+
+    from report import build_report
+
+    # report.py imports these on first use, once per server process rather than per report,
+    # so they are loaded here, outside the timed call.
+    for module in ("fpdf", "matplotlib.figure"):
+        importlib.import_module(module)
+
+    _, _, summary = _scored(ctx)
+    return lambda: {"pdf_bytes": len(build_report(summary, "bench@example.com", 0.5))}, ctx["rows"]
+
+
+STAGE_FUNCS = {name: globals()[f"stage_{name}"] for name in STAGES}
+
+
+def run_stage(name, ctx):
+    # Executed in a fresh spawned process: setup, then one timed call.
+    os.chdir(ctx["workdir"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn, rows = STAGE_FUNCS[name](ctx)
+        before = _peak_mb()
+        start = time.perf_counter()
+        out = fn()
+        seconds = time.perf_counter() - start
+    result = {
+        "stage": name,
+        "engine": ctx["engine"],
+        "rows": rows,
+        "fraud_ratio": ctx["fraud_ratio"],
+        "seconds": seconds,
+        "rows_per_sec": rows / max(seconds, 1e-9),
+        "peak_mb": _peak_mb(),
+        "stage_peak_mb": max(_peak_mb() - before, 0.0),
+    }
+    if isinstance(out, dict):
+        result.update(out)
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    import sklearn
+
+    return {
+        "commit": commit,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "cpus": os.cpu_count(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r.get("engine", DEFAULT_ENGINE), r["rows"], r["fraud_ratio"]): r
+                    for r in json.load(f)["results"]}
+    print(f"📊 Versus {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["stage"], r["engine"], r["rows"], r["fraud_ratio"]))
+        if old:
+            print(f"  {r['stage']:<11} {r['engine']:<4} {r['rows']:>10,}  time x{r['seconds'] / max(old['seconds'], 1e-9):5.2f}  "
+                  f"peak {r['peak_mb'] - old['peak_mb']:+8.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scoring, reporting and training paths on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000], help="dataset sizes to benchmark")
+    parser.add_argument("--fraud-ratio", type=float, nargs="+", default=[0.002])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=[DEFAULT_ENGINE],
+                        help="model engines to benchmark side by side")
+    parser.add_argument("--trees", type=int, default=50, help="trees (or boosting rounds) in the benchmark model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    stages = [s for s in STAGES if s in args.stages]
+    results = []
+    spawn = multiprocessing.get_context("spawn")
+    for rows in args.rows:
+        for fraud_ratio in args.fraud_ratio:
+            workdir = tempfile.mkdtemp(prefix="fraud_bench_")
+            try:
+                print(f"📥 {rows:,} synthetic rows, fraud ratio {fraud_ratio:g}...")
+                csv = os.path.join(workdir, "transactions.csv")
+                synthetic_transactions(rows, fraud_ratio, args.seed).to_csv(csv, index=False)
+                for engine in args.engines:
+                    ctx = {"csv": csv, "rows": rows, "fraud_ratio": fraud_ratio, "engine": engine,
+                           "trees": args.trees, "seed": args.seed, "workdir": workdir}
+                    # Every stage after training scores with the model trained here; train it even if not timed.
+                    if "train" not in stages:
+                        with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                            pool.submit(run_stage, "train", ctx).result()
+                    for name in stages:
+                        with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                            r = pool.submit(run_stage, name, ctx).result()
+                        results.append(r)
+                        print(f"  {name:<11} {engine:<4} {r['seconds']:8.3f} s  {r['rows_per_sec']:12,.0f} rows/s  "
+                              f"peak {r['peak_mb']:7.1f} MB (+{r['stage_peak_mb']:.1f})")
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"✅ Results written to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
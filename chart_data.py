@@ -0,0 +1,304 @@
+import numpy as np
+import pandas as pd
+
+# --- Chart Data Layer ---
+# Small summaries of a whole scored run, built chunk by chunk while it is scored. Every
+# count is kept per probability bin (PROBA_STEPS bins per unit, the threshold slider's
+# step), so the Visual Insights charts for any threshold are slice sums that never touch
+# the rows, and a redraw costs the same for 1,000 rows or 10 million.
+PROBA_STEPS = 100
+AMOUNT_BINS = 50
+# Rows drawn for density (KDE) plots: flagged rows (up to half), then a proportional legit sample.
+SAMPLE_ROWS = 20_000
+# Cap on individual points sent to the browser by the interactive dashboard.
+MAX_POINTS = 20_000
+# Time x Amount grid used for legit density once an upload exceeds MAX_POINTS rows.
+DENSITY_BINS = (120, 60)
+# Rows sampled per probability bin across all chunks; points, KDE and box plots draw on these.
+RESERVOIR_ROWS = 5_000
+
+
+class ChartData:
+    def __init__(self, counts, amount_edges, amount_hist, hourly, corr, sample, dashboard):
+        self.counts = counts
+        self.amount_edges = amount_edges
+        self.amount_hist = amount_hist
+        self.hourly = hourly
+        self.corr = corr
+        self.sample = sample
+        self.dashboard = dashboard
+
+    @property
+    def nbytes(self):
+        return int(self.amount_hist.nbytes + self.hourly.nbytes + self.corr.memory_usage().sum()
+                   + self.sample.memory_usage().sum() + self.dashboard.nbytes)
+
+
+# Interactive dashboard payload: fraud rows as individual points; legit rows as points
+# for small uploads and as a Time x Amount density grid for large ones; box-plot stats
+# per class so the browser never receives the raw Amount column.
+class DashboardData:
+    def __init__(self, fraud_points, legit_points, legit_density, amount_box):
+        self.fraud_points = fraud_points
+        self.legit_points = legit_points
+        self.legit_density = legit_density
+        self.amount_box = amount_box
+
+    @property
+    def nbytes(self):
+        size = self.fraud_points.memory_usage().sum()
+        if self.legit_points is not None:
+            size += self.legit_points.memory_usage().sum()
+        if self.legit_density is not None:
+            size += sum(a.nbytes for a in self.legit_density)
+        return int(size)
+
+
+def box_stats(values):
+    if not len(values):
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {"q1": q1, "median": median, "q3": q3,
+            "lowerfence": inside.min(), "upperfence": inside.max(), "n": len(values)}
+
+
+def proba_bins(proba):
+    return np.minimum((proba * PROBA_STEPS).astype(np.int64), PROBA_STEPS)
+
+
+def threshold_bin(threshold):
+    # Rows in bins at or above this one are flagged; exact for thresholds on the slider's step.
+    return int(np.ceil(round(threshold * PROBA_STEPS, 6)))
+
+
+# --- Streaming Summaries ---
+class GrowingHistogram:
+    # Counts on [0, hi) per value axis, by probability bin. When a value reaches hi, that
+    # axis's range doubles and neighbouring bins merge, so the range follows the data
+    # without ever re-reading rows. Negative values fall in the first bin.
+    def __init__(self, bins):
+        self.bins = bins
+        self.hi = None
+        self.counts = np.zeros(tuple(bins) + (PROBA_STEPS + 1,), dtype=np.int32)
+
+    def _double(self, axis):
+        counts = np.moveaxis(self.counts, axis, 0)
+        merged = counts[0::2] + counts[1::2]
+        self.counts = np.ascontiguousarray(np.moveaxis(np.concatenate([merged, np.zeros_like(merged)]), 0, axis))
+        self.hi[axis] *= 2
+
+    def update(self, values, pbin):
+        values = [np.clip(v, 0, None) for v in values]
+        if self.hi is None:
+            self.hi = [2.0 ** (np.floor(np.log2(max(v.max(), 1.0))) + 1) for v in values]
+        idx = []
+        for axis, v in enumerate(values):
+            while v.max() >= self.hi[axis]:
+                self._double(axis)
+            idx.append(np.minimum((v * (self.bins[axis] / self.hi[axis])).astype(np.int64), self.bins[axis] - 1))
+        flat = np.ravel_multi_index(idx + [pbin], self.counts.shape)
+        np.add(self.counts, np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape),
+               out=self.counts, casting="unsafe")
+
+    def split(self, cut):
+        # (legit, flagged) counts and per-axis edges, trimmed after the last non-empty bin.
+        legit, flagged = self.counts[..., :cut].sum(axis=-1), self.counts[..., cut:].sum(axis=-1)
+        total = legit + flagged
+        keep, edges = [], []
+        for axis, bins in enumerate(self.bins):
+            used = np.flatnonzero(total.sum(axis=tuple(a for a in range(total.ndim) if a != axis)))
+            last = used[-1] + 1 if len(used) else 1
+            keep.append(slice(0, last))
+            edges.append(np.linspace(0, (self.hi or [1.0] * len(self.bins))[axis] * last / bins, last + 1))
+        return legit[tuple(keep)], flagged[tuple(keep)], edges
+
+
+class Moments:
+    # Sums for the correlation matrix of the numeric columns, shifted by the first chunk's
+    # mean for precision. Like DataFrame.corr, each pair uses the rows where both values are
+    # present (only a label can be missing), so counts and sums are kept per pair: s[i, j]
+    # and q[i, j] are the sum and sum of squares of column i over rows where j is present.
+    # Prediction depends on the threshold, so its terms come from per-probability-bin sums.
+    def __init__(self):
+        self.shift = None
+        self.rows = 0
+
+    def update(self, X, pbin):
+        present = ~np.isnan(X)
+        if self.shift is None:
+            k = X.shape[1]
+            self.shift = np.nansum(X, axis=0) / np.maximum(present.sum(axis=0), 1)
+            self.n, self.s, self.q, self.ss = (np.zeros((k, k)) for _ in range(4))
+            self.bin_rows = np.zeros(PROBA_STEPS + 1)
+            self.bin_n = np.zeros((PROBA_STEPS + 1, k))
+            self.bin_s = np.zeros((PROBA_STEPS + 1, k))
+        X = np.where(present, X - self.shift, 0.0)
+        counts = np.bincount(pbin, minlength=PROBA_STEPS + 1)
+        self.rows += len(X)
+        self.bin_rows += counts
+        if present.all():
+            self.n += len(X)
+            self.s += X.sum(axis=0)[:, None]
+            self.q += (X * X).sum(axis=0)[:, None]
+            self.bin_n += counts[:, None]
+        else:
+            M = present.astype(np.float64)
+            self.n += M.T @ M
+            self.s += X.T @ M
+            self.q += (X * X).T @ M
+            for j in np.flatnonzero(~present.all(axis=0)):
+                self.bin_n[:, j] += np.bincount(pbin, weights=M[:, j], minlength=PROBA_STEPS + 1)
+            self.bin_n[:, present.all(axis=0)] += counts[:, None]
+        self.ss += X.T @ X
+        for j in range(X.shape[1]):
+            self.bin_s[:, j] += np.bincount(pbin, weights=X[:, j], minlength=PROBA_STEPS + 1)
+
+    def corr(self, cut):
+        # Correlations with a Prediction column (1 for rows at or above cut) appended last.
+        k = len(self.shift)
+        n, s, q, ss = (np.zeros((k + 1, k + 1)) for _ in range(4))
+        n[:k, :k], s[:k, :k], q[:k, :k], ss[:k, :k] = self.n, self.s, self.q, self.ss
+        # Prediction is never missing: pairs with it use every row where the other column is present.
+        n[k, :k] = n[:k, k] = np.diag(self.n)
+        s[:k, k], q[:k, k] = np.diag(self.s), np.diag(self.q)
+        s[k, :k] = q[k, :k] = self.bin_n[cut:].sum(axis=0)
+        ss[k, :k] = ss[:k, k] = self.bin_s[cut:].sum(axis=0)
+        n[k, k] = self.rows
+        s[k, k] = q[k, k] = ss[k, k] = self.bin_rows[cut:].sum()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = s / n
+            var = np.clip(q / n - mean ** 2, 0, None)
+            return (ss / n - mean * mean.T) / np.sqrt(var * var.T)
+
+    @property
+    def nbytes(self):
+        if self.shift is None:
+            return 0
+        return int(4 * self.ss.nbytes + self.bin_n.nbytes + self.bin_s.nbytes + self.bin_rows.nbytes)
+
+
+class Reservoir:
+    # Up to per_bin rows (Time, Amount, Fraud_Prob) per probability bin, sampled uniformly
+    # from the whole run: every row gets a random key and each bin keeps its smallest keys.
+    # Rows stay sorted by (bin, key), so any prefix of a bin is itself a uniform sample.
+    def __init__(self, per_bin=RESERVOIR_ROWS, seed=0):
+        self.per_bin = per_bin
+        self.rng = np.random.default_rng(seed)
+        self.seen = np.zeros(PROBA_STEPS + 1, dtype=np.int64)
+        self.bins = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0)
+        self.rows = np.empty((0, 3), dtype=np.float32)
+
+    def update(self, time, amount, proba, pbin):
+        self.seen += np.bincount(pbin, minlength=PROBA_STEPS + 1)
+        keys = self.rng.random(len(pbin))
+        # A full bin only takes rows with a smaller key than its largest kept one.
+        cutoff = np.ones(PROBA_STEPS + 1)
+        full = np.bincount(self.bins, minlength=PROBA_STEPS + 1) >= self.per_bin
+        last = np.searchsorted(self.bins, np.arange(PROBA_STEPS + 1), side="right") - 1
+        cutoff[full] = self.keys[last[full]]
+        enter = keys < cutoff[pbin]
+        if not enter.any():
+            return
+        bins = np.concatenate([self.bins, pbin[enter]])
+        keys = np.concatenate([self.keys, keys[enter]])
+        new = np.column_stack([time[enter], amount[enter], proba[enter]]).astype(np.float32)
+        rows = np.concatenate([self.rows, new])
+        order = np.lexsort((keys, bins))
+        sorted_bins = bins[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_bins, sorted_bins)
+        order = order[rank < self.per_bin]
+        self.bins, self.keys, self.rows = bins[order], keys[order], rows[order]
+
+    def sample(self, selected, size):
+        # About size rows from the selected bins, in proportion to how many rows each bin saw,
+        # so the sample stands for all of those rows and not just the ones kept.
+        total = np.where(selected, self.seen, 0)
+        kept = np.where(selected, np.bincount(self.bins, minlength=PROBA_STEPS + 1), 0)
+        if not total.sum() or size <= 0:
+            return self.rows[:0]
+        present = total > 0
+        scale = min(size / total.sum(), (kept[present] / total[present]).min())
+        take = np.minimum(kept, np.ceil(total * scale)).astype(np.int64)
+        start = np.searchsorted(self.bins, np.arange(PROBA_STEPS + 1))
+        return self.rows[np.concatenate([np.arange(start[b], start[b] + take[b]) for b in np.flatnonzero(take)])]
+
+    def complete(self, selected):
+        # True if every row in the selected bins was kept.
+        kept = np.bincount(self.bins, minlength=PROBA_STEPS + 1)
+        return bool((kept[selected] == self.seen[selected]).all())
+
+    @property
+    def nbytes(self):
+        return int(self.seen.nbytes + self.bins.nbytes + self.keys.nbytes + self.rows.nbytes)
+
+
+class ChartSketch:
+    def __init__(self, seed=0):
+        self.amount = GrowingHistogram((AMOUNT_BINS,))
+        self.density = GrowingHistogram(DENSITY_BINS)
+        self.moments = Moments()
+        self.reservoir = Reservoir(RESERVOIR_ROWS, seed)
+        self.columns = None
+
+    def update(self, scored, proba):
+        if not len(proba):
+            return
+        pbin = proba_bins(proba)
+        time = scored["Time"].to_numpy(dtype=np.float64)
+        amount = scored["Amount"].to_numpy(dtype=np.float64)
+        self.amount.update([amount], pbin)
+        self.density.update([time, amount], pbin)
+        if self.columns is None:
+            # Numeric columns as in the scored frame; Prediction is added per threshold.
+            self.columns = [c for c in scored.select_dtypes(include="number").columns if c != "Prediction"]
+        self.moments.update(scored[self.columns].to_numpy(dtype=np.float64, na_value=np.nan), pbin)
+        self.reservoir.update(time, amount, proba, pbin)
+
+    @property
+    def nbytes(self):
+        return int(self.amount.counts.nbytes + self.density.counts.nbytes + self.moments.nbytes
+                   + self.reservoir.nbytes)
+
+    def chart_data(self, threshold, hourly):
+        # hourly: (24, 2) legit/fraud counts per hour, from the run's ScoreSummary.by_hour.
+        cut = threshold_bin(threshold)
+        flagged_bins = np.arange(PROBA_STEPS + 1) >= cut
+        seen = self.reservoir.seen
+        counts = np.array([seen[~flagged_bins].sum(), seen[flagged_bins].sum()])
+
+        legit, flagged, (edges,) = self.amount.split(cut)
+        amount_hist = np.column_stack([legit, flagged])
+
+        # Prediction sits before Fraud_Prob, as in the scored frame.
+        corr = self.moments.corr(cut)
+        order = list(range(len(self.columns)))
+        at = self.columns.index("Fraud_Prob") if "Fraud_Prob" in self.columns else len(self.columns)
+        order.insert(at, len(self.columns))
+        names = self.columns[:at] + ["Prediction"] + self.columns[at:]
+        corr = pd.DataFrame(corr[np.ix_(order, order)], index=names, columns=names)
+
+        fraud_rows = self.reservoir.sample(flagged_bins, MAX_POINTS)
+        legit_rows = self.reservoir.sample(~flagged_bins, SAMPLE_ROWS)
+        # Flagged rows take up to half the KDE sample, so the legit curve always has rows to draw on.
+        kde_fraud = self.reservoir.sample(flagged_bins, SAMPLE_ROWS // 2)
+        kde_legit = self.reservoir.sample(~flagged_bins, SAMPLE_ROWS - len(kde_fraud))
+        sample = pd.DataFrame({
+            "log_amount": np.log1p(np.concatenate([kde_fraud[:, 1], kde_legit[:, 1]]).astype(np.float64)),
+            "Prediction": np.repeat([1, 0], [len(kde_fraud), len(kde_legit)]),
+        })
+
+        def points(rows):
+            return pd.DataFrame(rows, columns=["Time", "Amount", "Fraud_Prob"])
+
+        legit_points = legit_density = None
+        if counts.sum() <= MAX_POINTS and self.reservoir.complete(~flagged_bins):
+            legit_points = points(self.reservoir.sample(~flagged_bins, MAX_POINTS))
+        elif counts[0]:
+            grid, _, (x_edges, y_edges) = self.density.split(cut)
+            legit_density = (grid.T, x_edges, y_edges)
+        amount_box = {0: box_stats(legit_rows[:, 1]), 1: box_stats(fraud_rows[:, 1])}
+        dashboard = DashboardData(points(fraud_rows), legit_points, legit_density, amount_box)
+        return ChartData(counts, edges, amount_hist, hourly, corr, sample, dashboard)
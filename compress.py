@@ -0,0 +1,222 @@
+import argparse
+import copy
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from engines import FOREST_ENGINES, engine_of
+from model_compare import time_split
+from scoring import DTYPES, FEATURES, LABEL, MODEL_PATH, SCALER_PATH, load_artifacts
+from train_model import DATA_PATH
+
+# --- Forest Compression ---
+# Smaller variants of the saved forest, each still a fitted RandomForestClassifier so the
+# app, SHAP explanations, flat_forest.py and model_bundle.py take them unchanged:
+#   subset-K     the K trees whose average best matches the full forest (greedy selection)
+#   depth-D      every tree cut at depth D; a cut node predicts its class distribution
+#   distill-NxD  N regression trees of depth D fitted to the forest's predict_proba
+# Variants are compared on the latest transactions (by Time); earlier ones drive tree
+# selection and distillation. If the forest was trained on the same file, its metrics are
+# optimistic, but the comparison between variants still holds.
+OUT_DIR = "model/compressed"
+# Rows the greedy tree selection scores every tree on (a trees x rows matrix).
+SELECT_ROWS = 50_000
+# Rows the distilled students are fitted on.
+DISTILL_ROWS = 200_000
+# Rows timed for throughput, scored single-threaded.
+BENCH_ROWS = 100_000
+REPEATS = 3
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+# --- Tree Surgery ---
+def _classifier_tree(template, state):
+    # A fitted DecisionTreeClassifier like template, with its tree_ rebuilt from a Tree state.
+    from sklearn.tree._tree import Tree
+
+    tree = Tree(template.n_features_in_, np.array([template.n_classes_], dtype=np.intp), template.n_outputs_)
+    tree.__setstate__(state)
+    est = copy.copy(template)
+    est.tree_ = tree
+    return est
+
+
+def _forest(template, trees, **params):
+    forest = copy.copy(template)
+    forest.estimators_ = list(trees)
+    forest.n_estimators = len(trees)
+    for key, value in params.items():
+        setattr(forest, key, value)
+    return forest
+
+
+def truncate_tree(est, depth):
+    # Keeps nodes down to depth, renumbered depth-first like sklearn (left child = parent + 1,
+    # which flat_forest.py relies on); nodes at the cut become leaves.
+    state = est.tree_.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+    kept, index, stack = [], {}, [(0, 0)]
+    while stack:
+        node, d = stack.pop()
+        index[node] = len(kept)
+        kept.append((node, d))
+        if nodes["left_child"][node] != TREE_LEAF and d < depth:
+            stack.append((nodes["right_child"][node], d + 1))
+            stack.append((nodes["left_child"][node], d + 1))
+
+    order = np.array([node for node, _ in kept], dtype=np.intp)
+    new_nodes = nodes[order]
+    for i, (node, d) in enumerate(kept):
+        if nodes["left_child"][node] == TREE_LEAF or d >= depth:
+            new_nodes["left_child"][i] = new_nodes["right_child"][i] = TREE_LEAF
+            new_nodes["feature"][i] = TREE_UNDEFINED
+            new_nodes["threshold"][i] = TREE_UNDEFINED
+        else:
+            new_nodes["left_child"][i] = index[nodes["left_child"][node]]
+            new_nodes["right_child"][i] = index[nodes["right_child"][node]]
+    return _classifier_tree(est, {"max_depth": min(depth, state["max_depth"]), "node_count": len(kept),
+                                  "nodes": new_nodes, "values": np.ascontiguousarray(values[order])})
+
+
+def regression_to_classifier(template, reg):
+    # A regression tree fitted to P(fraud) becomes a classifier tree with leaves [1 - p, p].
+    state = reg.tree_.__getstate__()
+    p = np.clip(state["values"][:, 0, 0], 0.0, 1.0)
+    state["values"] = np.ascontiguousarray(np.stack([1 - p, p], axis=-1)[:, None, :])
+    return _classifier_tree(template, state)
+
+
+# --- Variants ---
+def select_trees(per_tree, target, k_max):
+    # Greedy forward selection: each step adds the tree that brings the subset's average
+    # closest (squared error) to the full forest. Prefixes of the order are the K-subsets.
+    chosen, total = [], np.zeros(per_tree.shape[1])
+    for step in range(min(k_max, len(per_tree))):
+        err = (((total + per_tree) / (step + 1) - target) ** 2).mean(axis=1)
+        err[chosen] = np.inf
+        best = int(np.argmin(err))
+        chosen.append(best)
+        total += per_tree[best]
+    return chosen
+
+
+def subset_variants(forest, X_select, sizes):
+    if not sizes:
+        return {}
+    per_tree = np.stack([est.predict_proba(X_select)[:, 1] for est in forest.estimators_])
+    order = select_trees(per_tree, per_tree.mean(axis=0), max(sizes))
+    return {f"subset-{k}": _forest(forest, [forest.estimators_[i] for i in order[:k]])
+            for k in sizes if k < forest.n_estimators}
+
+
+def depth_variants(forest, depths):
+    return {f"depth-{d}": _forest(forest, [truncate_tree(est, d) for est in forest.estimators_], max_depth=d)
+            for d in depths}
+
+
+def distill(forest, X, soft, n_estimators, max_depth, seed=42):
+    from sklearn.ensemble import RandomForestRegressor
+
+    student = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, n_jobs=-1, random_state=seed)
+    student.fit(X, soft)
+    trees = [regression_to_classifier(forest.estimators_[0], reg) for reg in student.estimators_]
+    return _forest(forest, trees, max_depth=max_depth)
+
+
+# --- Report ---
+def _best_of(fn, repeats=REPEATS):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def evaluate(name, model, path, X_eval, y_eval, reference, threshold):
+    from sklearn.metrics import average_precision_score
+
+    model.n_jobs = 1
+    proba = model.predict_proba(X_eval)[:, 1]
+    flagged = proba >= threshold
+    positives = max(int(y_eval.sum()), 1)
+    X_bench = X_eval[:BENCH_ROWS]
+    predict_seconds = _best_of(lambda: model.predict_proba(X_bench))
+    return {
+        "variant": name,
+        "trees": len(model.estimators_),
+        "max_depth": max(est.tree_.max_depth for est in model.estimators_),
+        "nodes": int(sum(est.tree_.node_count for est in model.estimators_)),
+        "pr_auc": round(float(average_precision_score(y_eval, proba)), 4),
+        "recall": round(float((flagged & (y_eval == 1)).sum() / positives), 4),
+        "precision": round(float((flagged & (y_eval == 1)).sum() / max(int(flagged.sum()), 1)), 4),
+        "agreement": round(float((flagged == (reference >= threshold)).mean()), 5),
+        "mean_abs_diff": round(float(np.abs(proba - reference).mean()), 5),
+        "size_mb": round(os.path.getsize(path) / 2**20, 3),
+        "load_ms": round(_best_of(lambda: joblib.load(path)) * 1000, 2),
+        "rows_per_sec": round(len(X_bench) / predict_seconds, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compress the fraud forest and report the latency/accuracy trade-off.")
+    parser.add_argument("--data", default=DATA_PATH, help="labelled transactions to select, distill and evaluate on")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--subset-sizes", type=int, nargs="*", default=[10, 25, 50])
+    parser.add_argument("--depths", type=int, nargs="*", default=[6, 8, 10])
+    parser.add_argument("--distill", nargs="*", default=["30x6", "50x8"], help="student sizes as TREESxDEPTH")
+    parser.add_argument("--threshold", type=float, default=0.5, help="alert threshold for recall and agreement")
+    parser.add_argument("--test-fraction", type=float, default=0.3)
+    parser.add_argument("--out-dir", default=OUT_DIR, help="variant pickles and report.json are written here")
+    args = parser.parse_args(argv)
+
+    forest, scaler = load_artifacts(args.model, args.scaler)
+    if engine_of(forest) not in FOREST_ENGINES:
+        raise SystemExit(f"❌ compress.py works on random forests; {args.model} has engine {engine_of(forest)}.")
+    df = pd.read_csv(args.data, usecols=FEATURES + [LABEL], dtype={**DTYPES, LABEL: np.int8})
+    X = scaler.transform(df[FEATURES])
+    X_fit, X_eval, _, y_eval = time_split(X, df[LABEL].to_numpy(), df["Time"].to_numpy(), args.test_fraction)
+    del df, X
+    rng = np.random.default_rng(0)
+    print(f"📥 {len(X_fit):,} rows for selection/distillation, {len(X_eval):,} for evaluation")
+
+    forest.n_jobs = -1
+    X_distill = X_fit[rng.permutation(len(X_fit))[:DISTILL_ROWS]]
+    variants = {"original": forest}
+    variants.update(subset_variants(forest, X_fit[rng.permutation(len(X_fit))[:SELECT_ROWS]], args.subset_sizes))
+    variants.update(depth_variants(forest, args.depths))
+    if args.distill:
+        soft = forest.predict_proba(X_distill)[:, 1]
+        for spec in args.distill:
+            n_estimators, max_depth = (int(v) for v in spec.lower().split("x"))
+            variants[f"distill-{spec}"] = distill(forest, X_distill, soft, n_estimators, max_depth)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    forest.n_jobs = 1
+    reference = forest.predict_proba(X_eval)[:, 1]
+    results = []
+    for name, model in variants.items():
+        path = os.path.join(args.out_dir, f"fraud_model_{name}.pkl")
+        joblib.dump(model, path)
+        r = evaluate(name, model, path, X_eval, y_eval, reference, args.threshold)
+        results.append(r)
+        print(f"  {name:<14} {r['trees']:>4} trees  depth {r['max_depth']:>2}  PR-AUC {r['pr_auc']:.4f}  "
+              f"recall {r['recall']:.3f}  {r['size_mb']:8.2f} MB  load {r['load_ms']:8.1f} ms  "
+              f"{r['rows_per_sec']:>12,.0f} rows/s")
+
+    report_path = os.path.join(args.out_dir, "report.json")
+    with open(report_path, "w") as f:
+        json.dump({"model": args.model, "data": args.data, "threshold": args.threshold,
+                   "eval_rows": len(X_eval), "results": results}, f, indent=2)
+    print(f"✅ Variants and report written to {args.out_dir}; register one with "
+          f"`python registry.py register --model {args.out_dir}/fraud_model_<variant>.pkl --as candidate`")
+
+
+if __name__ == "__main__":
+    main()
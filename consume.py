@@ -0,0 +1,391 @@
+import argparse
+import glob
+import json
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from scoring import FEATURES, MODEL_PATH, SCALER_PATH, load_artifacts
+
+# --- Streaming Consumer ---
+# Tails an append-only JSON-lines source, one transaction object per line, and scores it
+# in small windows: up to --window-rows lines, or whatever arrived within --window-ms of
+# the first one. Each window is one vectorized predict_proba call. Alerts above the
+# threshold are appended to an alerts file and fsynced before the checkpoint moves past
+# them, so delivery is at-least-once: after a crash the last window is scored again and
+# its alerts may repeat. (source, offset) identifies a transaction for de-duplication.
+ALERTS_PATH = "monitoring/alerts.jsonl"
+REJECTS_PATH = "monitoring/rejected.jsonl"
+CHECKPOINT_PATH = "monitoring/consumer_checkpoint.json"
+METRICS_PATH = "monitoring/consumer_metrics.json"
+# Lines handed from the reader thread to the scorer at a time.
+READ_LINES = 500
+# Seconds the reader sleeps when it has caught up with the source.
+POLL_SECONDS = 0.05
+# Throughput is reported over this trailing window as well as since startup.
+SUSTAINED_SECONDS = 60
+
+
+# --- Sources ---
+# One JSON-lines file, or a spool directory of *.jsonl files read in name order. A
+# position is (file name, byte offset of the next unread line). Spool writers must finish
+# a file before creating the next one; a file is left once a later one exists and it has
+# been read to the end.
+class LineSource:
+    def __init__(self, path, position=None):
+        self.path = path
+        self.spool = os.path.isdir(path)
+        self.name, self.offset = position or (None, 0)
+        self.handle = None
+
+    def _path(self, name):
+        return os.path.join(self.path, name) if self.spool else self.path
+
+    def files(self):
+        if not self.spool:
+            return [os.path.basename(self.path)] if os.path.exists(self.path) else []
+        return sorted(os.path.basename(p) for p in glob.glob(os.path.join(self.path, "*.jsonl")))
+
+    def _open(self):
+        files = self.files()
+        if not self.spool and files and self.name != files[0]:
+            # A checkpoint from a different file does not apply to this one.
+            self.name, self.offset = files[0], 0
+        if self.name is None or self.name not in files:
+            # First run, or the checkpointed file is gone: continue with the next file after it.
+            later = [f for f in files if self.name is None or f > self.name]
+            if not later:
+                return False
+            self.name, self.offset = later[0], 0
+        self.handle = open(self._path(self.name), "rb")
+        self.handle.seek(self.offset)
+        return True
+
+    def _advance(self):
+        # At the end of the current file: move to the next spool file, or notice a truncated file.
+        size = os.path.getsize(self._path(self.name)) if os.path.exists(self._path(self.name)) else 0
+        if not self.spool:
+            if size < self.offset:
+                print(f"⚠️ {self.path} shrank below the checkpoint; reading it again from the start.")
+                self.handle.close()
+                self.handle, self.offset = None, 0
+                return True
+            return False
+        later = [f for f in self.files() if f > self.name]
+        if not later or size > self.offset:
+            return False
+        self.handle.close()
+        self.handle, self.name, self.offset = None, later[0], 0
+        return True
+
+    def read(self, max_lines=READ_LINES):
+        # Complete lines from the current position as [(file, offset, line)]; [] when caught up.
+        lines = []
+        while len(lines) < max_lines:
+            if self.handle is None and not self._open():
+                break
+            line = self.handle.readline()
+            if not line.endswith(b"\n"):
+                # End of file, possibly mid-write: the partial line is read again next time.
+                self.handle.seek(self.offset)
+                if lines or not self._advance():
+                    break
+                continue
+            lines.append((self.name, self.offset, line))
+            self.offset += len(line)
+        return lines
+
+    def lag_bytes(self):
+        # Bytes written to the source but not yet read.
+        files = self.files()
+        if self.name is None:
+            return sum(os.path.getsize(self._path(f)) for f in files)
+        return sum(max(os.path.getsize(self._path(f)) - (self.offset if f == self.name else 0), 0)
+                   for f in files if f >= self.name)
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+
+
+# --- Checkpoint ---
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    return state["file"], state["offset"]
+
+
+def write_json_atomic(path, obj):
+    # Written beside the target and renamed over it, so a crash leaves the old or the new file.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# --- Throughput Metrics ---
+class ConsumerMetrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.alerts = 0
+        self.rejected = 0
+        self.windows = 0
+        # Time the reader spent blocked on a full queue, i.e. held back by backpressure.
+        self.blocked_seconds = 0.0
+        self.recent = deque()
+        self.score_ms = deque(maxlen=10_000)
+        self.window_ms = deque(maxlen=10_000)
+        self.window_rows = deque(maxlen=10_000)
+
+    def record_window(self, rows, alerts, rejected, score_ms, window_ms):
+        now = time.monotonic()
+        self.rows += rows
+        self.alerts += alerts
+        self.rejected += rejected
+        self.windows += 1
+        self.recent.append((now, rows))
+        while self.recent and self.recent[0][0] < now - SUSTAINED_SECONDS:
+            self.recent.popleft()
+        self.score_ms.append(score_ms)
+        self.window_ms.append(window_ms)
+        self.window_rows.append(rows)
+
+    def snapshot(self, pending_rows=0, lag_bytes=0):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        recent = sum(rows for _, rows in self.recent)
+        span = min(elapsed, SUSTAINED_SECONDS)
+
+        def pct(values):
+            arr = np.fromiter(values, dtype=np.float64)
+            p50, p99 = np.percentile(arr, [50, 99]) if arr.size else (0.0, 0.0)
+            return {"p50": round(float(p50), 3), "p99": round(float(p99), 3)}
+
+        return {
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "uptime_seconds": round(elapsed, 1),
+            "rows": self.rows,
+            "alerts": self.alerts,
+            "rejected": self.rejected,
+            "windows": self.windows,
+            "rows_per_sec": round(self.rows / elapsed, 1),
+            f"rows_per_sec_last_{SUSTAINED_SECONDS}s": round(recent / span, 1),
+            "mean_window_rows": round(float(np.mean(self.window_rows)), 1) if self.window_rows else 0.0,
+            "score_ms": pct(self.score_ms),
+            "window_ms": pct(self.window_ms),
+            "pending_rows": pending_rows,
+            "lag_bytes": lag_bytes,
+            "reader_blocked_seconds": round(self.blocked_seconds, 3),
+        }
+
+
+# --- Consumer ---
+class StreamConsumer:
+    def __init__(self, source, predict, threshold=0.5, window_rows=2000, window_ms=200.0, max_pending=50_000,
+                 alerts_path=ALERTS_PATH, rejects_path=REJECTS_PATH, checkpoint_path=CHECKPOINT_PATH,
+                 exit_at_eof=False):
+        self.source = source
+        self.predict = predict
+        self.threshold = threshold
+        self.window_rows = window_rows
+        self.window_wait = window_ms / 1000
+        # Bounded hand-off: when scoring falls behind, the reader blocks and the backlog stays
+        # in the source (visible as lag_bytes) instead of growing in memory.
+        self.queue = queue.Queue(maxsize=max(max_pending // READ_LINES, 1))
+        self.alerts_path = alerts_path
+        self.rejects_path = rejects_path
+        self.checkpoint_path = checkpoint_path
+        self.exit_at_eof = exit_at_eof
+        self.metrics = ConsumerMetrics()
+        self.stopped = threading.Event()
+        self.eof = False
+        self.carry = []
+        self.reader = None
+
+    def start(self):
+        self.reader = threading.Thread(target=self._read_loop, name="consumer-reader", daemon=True)
+        self.reader.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _read_loop(self):
+        while not self.stopped.is_set():
+            lines = self.source.read()
+            if not lines:
+                if self.exit_at_eof:
+                    self._put(None)
+                    return
+                self.stopped.wait(POLL_SECONDS)
+                continue
+            self._put(lines)
+
+    def _put(self, item):
+        start = time.monotonic()
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        self.metrics.blocked_seconds += time.monotonic() - start
+
+    def pending_rows(self):
+        return self.queue.qsize() * READ_LINES + len(self.carry)
+
+    def next_window(self):
+        # Up to window_rows lines, waiting at most window_ms after the first one arrives.
+        lines, self.carry = self.carry, []
+        deadline = time.monotonic() + self.window_wait if lines else None
+        while len(lines) < self.window_rows and not self.eof:
+            timeout = POLL_SECONDS if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                if deadline is None and self.stopped.is_set():
+                    break
+                continue
+            if batch is None:
+                self.eof = True
+                break
+            lines.extend(batch)
+            if deadline is None:
+                deadline = time.monotonic() + self.window_wait
+        self.carry = lines[self.window_rows:]
+        return lines[:self.window_rows]
+
+    def score_window(self, lines):
+        start = time.perf_counter()
+        rows, kept, rejects = [], [], []
+        for name, offset, line in lines:
+            try:
+                txn = json.loads(line)
+                rows.append([float(txn[col]) for col in FEATURES])
+                kept.append((name, offset, txn))
+            except (ValueError, TypeError, KeyError) as exc:
+                rejects.append({"source": name, "offset": offset, "reason": f"{type(exc).__name__}: {exc}",
+                                "line": line.decode(errors="replace").rstrip("\n")})
+        X = np.array(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+        finite = np.isfinite(X).all(axis=1)
+        if not finite.all():
+            for i in np.flatnonzero(~finite):
+                name, offset, txn = kept[i]
+                rejects.append({"source": name, "offset": offset, "reason": "non-finite feature value",
+                                "line": json.dumps(txn)})
+            X = X[finite]
+            kept = [k for k, ok in zip(kept, finite) if ok]
+
+        score_start = time.perf_counter()
+        proba = self.predict(X) if len(X) else np.empty(0)
+        score_ms = (time.perf_counter() - score_start) * 1000
+
+        scored_at = datetime.now().isoformat(timespec="milliseconds")
+        alerts = [{"source": name, "offset": offset, "Fraud_Prob": round(float(p), 4), "scored_at": scored_at,
+                   "transaction": txn}
+                  for (name, offset, txn), p in zip(kept, proba) if p >= self.threshold]
+        self._append(self.alerts_path, alerts)
+        self._append(self.rejects_path, rejects)
+        # Only after the alerts are on disk does the checkpoint move past the window.
+        name, offset, line = lines[-1]
+        write_json_atomic(self.checkpoint_path, {"file": name, "offset": offset + len(line),
+                                                 "updated": scored_at})
+        self.metrics.record_window(len(X), len(alerts), len(rejects), score_ms,
+                                   (time.perf_counter() - start) * 1000)
+        return alerts
+
+    @staticmethod
+    def _append(path, records):
+        if not records:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, metrics_path=METRICS_PATH, report_every=10.0):
+        self.start()
+        next_report = time.monotonic() + report_every
+        try:
+            while True:
+                lines = self.next_window()
+                if lines:
+                    self.score_window(lines)
+                done = self.eof and not self.carry
+                if time.monotonic() >= next_report or done or (self.stopped.is_set() and not lines):
+                    self.report(metrics_path)
+                    next_report = time.monotonic() + report_every
+                if done or (self.stopped.is_set() and not lines):
+                    break
+        finally:
+            self.stopped.set()
+            self.reader.join()
+            self.source.close()
+        return self.metrics
+
+    def report(self, metrics_path):
+        snapshot = self.metrics.snapshot(self.pending_rows(), self.source.lag_bytes())
+        write_json_atomic(metrics_path, snapshot)
+        print(f"📈 {snapshot['rows']:,} rows · {snapshot[f'rows_per_sec_last_{SUSTAINED_SECONDS}s']:,.0f} rows/s · "
+              f"{snapshot['alerts']:,} alerts · {snapshot['rejected']:,} rejected · "
+              f"window p99 {snapshot['window_ms']['p99']:.1f} ms · {snapshot['pending_rows']:,} pending · "
+              f"lag {snapshot['lag_bytes']:,} B", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a stream of JSON-lines transactions in small windows.")
+    parser.add_argument("source", help="append-only .jsonl file, or a spool directory of .jsonl files")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--window-rows", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=200.0,
+                        help="how long the first transaction in a window waits for company")
+    parser.add_argument("--max-pending", type=int, default=50_000,
+                        help="rows read ahead of scoring before the reader pauses")
+    parser.add_argument("--alerts", default=ALERTS_PATH)
+    parser.add_argument("--rejects", default=REJECTS_PATH)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--metrics", default=METRICS_PATH)
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between metrics reports")
+    parser.add_argument("--exit-at-eof", action="store_true", help="drain the source and exit (for sizing runs)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--bundle", help="memory-mapped model bundle to score with instead of the pickles")
+    args = parser.parse_args(argv)
+
+    from serve import bundle_predictor, sklearn_predictor
+
+    if args.bundle:
+        from model_bundle import load_bundle
+
+        predict = bundle_predictor(load_bundle(args.bundle))
+    else:
+        predict = sklearn_predictor(*load_artifacts(args.model, args.scaler))
+
+    position = load_checkpoint(args.checkpoint)
+    if position:
+        print(f"↩️ Resuming {args.source} at {position[0]}:{position[1]:,}")
+    consumer = StreamConsumer(LineSource(args.source, position), predict, args.threshold, args.window_rows,
+                              args.window_ms, args.max_pending, args.alerts, args.rejects, args.checkpoint,
+                              args.exit_at_eof)
+    # Finish the window in flight and checkpoint it before exiting.
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: consumer.stop())
+    metrics = consumer.run(args.metrics, args.report_every)
+    print(f"✅ Scored {metrics.rows:,} transactions, {metrics.alerts:,} alerts")
+
+
+if __name__ == "__main__":
+    main()
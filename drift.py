@@ -0,0 +1,151 @@
+import json
+import math
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from scoring import FEATURES
+
+# --- Drift Monitoring ---
+# Every scored run (and the HTTP service's live traffic) keeps a fixed-size sketch: a
+# histogram per feature on bins standardized with the scaler's mean_ / scale_, plus a
+# Fraud_Prob histogram. Features are compared with the training data's histogram on the
+# same bins (saved by train_model.py), or, for artifacts trained before it existed, with
+# the normal distribution implied by mean_ / scale_. Fraud_Prob is compared with the
+# pooled histogram of all earlier runs.
+DRIFT_PATH = "monitoring/drift.jsonl"
+BASELINE_PATH = "model/drift_baseline.npy"
+# Time counts seconds from the start of each file, so it is not monitored.
+DRIFT_FEATURES = [col for col in FEATURES if col != "Time"]
+# Bin edges in standard deviations from the training mean; two open tail bins are added.
+Z_EDGES = np.linspace(-4.0, 4.0, 17)
+Z_WIDTH = Z_EDGES[1] - Z_EDGES[0]
+SCORE_BINS = 20
+# Conventional PSI bands: below WARN is stable, above ALERT is a significant shift.
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+# Floor for empty bins so PSI stays finite.
+EPSILON = 1e-4
+
+
+def normal_fractions(edges=Z_EDGES):
+    cdf = np.array([0.0] + [0.5 * (1 + math.erf(e / math.sqrt(2))) for e in edges] + [1.0])
+    return np.diff(cdf)
+
+
+def psi(actual, expected):
+    a = np.maximum(actual / max(actual.sum(), 1), EPSILON)
+    e = np.maximum(expected / max(expected.sum(), 1e-12), EPSILON)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks(actual, expected):
+    # Largest CDF gap at the bin edges (exact for the baseline, binned for the run).
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    e = np.cumsum(expected) / max(expected.sum(), 1e-12)
+    return float(np.max(np.abs(a - e)))
+
+
+def level(value):
+    return "alert" if value >= PSI_ALERT else "warn" if value >= PSI_WARN else "ok"
+
+
+class DriftSketch:
+    def __init__(self, mean, scale):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.rows = 0
+        self.counts = np.zeros((len(FEATURES), len(Z_EDGES) + 1), dtype=np.int64)
+        self.score_counts = np.zeros(SCORE_BINS, dtype=np.int64)
+        self.offsets = np.arange(len(FEATURES)) * self.counts.shape[1]
+
+    def update(self, X, proba=None):
+        # One vectorized pass over a chunk that is already in memory for scoring.
+        z = (np.asarray(X, dtype=np.float32) - self.mean) / self.scale
+        bins = np.clip(np.floor((z - Z_EDGES[0]) / Z_WIDTH) + 1, 0, len(Z_EDGES)).astype(np.int64)
+        self.counts += np.bincount((bins + self.offsets).ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        if proba is not None:
+            score_bins = np.minimum((np.asarray(proba) * SCORE_BINS).astype(np.int64), SCORE_BINS - 1)
+            self.score_counts += np.bincount(score_bins, minlength=SCORE_BINS)
+        self.rows += len(z)
+
+
+def save_baseline(sketch, path=BASELINE_PATH):
+    np.save(path, sketch.counts)
+
+
+def load_baseline(path=BASELINE_PATH):
+    # (features, bins) expected counts for the training data.
+    if os.path.exists(path):
+        return np.load(path)
+    return np.tile(normal_fractions(), (len(FEATURES), 1))
+
+
+class DriftMonitor:
+    def __init__(self, path=DRIFT_PATH, baseline_path=BASELINE_PATH):
+        self.path = path
+        self.baseline = load_baseline(baseline_path)
+        self.lock = threading.Lock()
+        self.records = None
+        self.mtime = None
+        self.reference = np.zeros(SCORE_BINS, dtype=np.int64)
+
+    def _load(self):
+        # Re-read the log only when another process (app or service) appended to it.
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if self.records is None or mtime != self.mtime:
+            self.records, self.reference[:] = [], 0
+            if mtime is not None:
+                with open(self.path) as f:
+                    self.records = [json.loads(line) for line in f if line.strip()]
+            for record in self.records:
+                self.reference += np.asarray(record["score_counts"], dtype=np.int64)
+            self.mtime = mtime
+
+    def report(self, sketch):
+        with self.lock:
+            self._load()
+            reference = self.reference.copy()
+        features = {}
+        for col in DRIFT_FEATURES:
+            i = FEATURES.index(col)
+            features[col] = {"psi": round(psi(sketch.counts[i], self.baseline[i]), 4),
+                             "ks": round(ks(sketch.counts[i], self.baseline[i]), 4)}
+        scores = None
+        if reference.sum() and sketch.rows:
+            scores = {"psi": round(psi(sketch.score_counts, reference), 4),
+                      "ks": round(ks(sketch.score_counts, reference), 4)}
+        worst = max(features, key=lambda col: features[col]["psi"])
+        return {
+            "rows": sketch.rows,
+            "features": features,
+            "max_feature_psi": features[worst]["psi"],
+            "worst_feature": worst,
+            "score": scores,
+            "level": level(max(features[worst]["psi"], scores["psi"] if scores else 0.0)),
+        }
+
+    def record(self, sketch, **meta):
+        entry = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            **meta,
+            **self.report(sketch),
+            "score_counts": sketch.score_counts.tolist(),
+        }
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._load()
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            # Fold our own entry in without re-reading the log.
+            self.records.append(entry)
+            self.reference += sketch.score_counts
+            self.mtime = os.path.getmtime(self.path)
+        return entry
+
+    def history(self):
+        with self.lock:
+            self._load()
+            return list(self.records)
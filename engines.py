@@ -0,0 +1,43 @@
+import importlib
+
+# --- Model Engines ---
+# name -> (module, class, default hyperparameters), as in model_compare.CANDIDATES.
+# Scoring only ever calls predict_proba, so the app, batch scoring, the consumer and the
+# HTTP service serve any engine unchanged; a saved model declares its engine through its
+# class, which is pickled with it and travels through the registry untouched.
+#   rf   random forest of full-precision trees (the original model)
+#   hgb  histogram gradient boosting: features binned to 255 levels, shallow leaf-wise trees
+ENGINES = {
+    "rf": ("sklearn.ensemble", "RandomForestClassifier", {"n_jobs": -1}),
+    # A fixed number of boosting rounds, so --n-estimators means the same thing on every run.
+    "hgb": ("sklearn.ensemble", "HistGradientBoostingClassifier", {"early_stopping": False}),
+}
+DEFAULT_ENGINE = "rf"
+# Engines whose fitted model is a list of sklearn decision trees; flat_forest.py,
+# model_bundle.py and compress.py only take these.
+FOREST_ENGINES = ("rf",)
+
+
+def make_model(engine, params=None, seed=42):
+    module, cls, defaults = ENGINES[engine]
+    return getattr(importlib.import_module(module), cls)(**{**defaults, **(params or {})}, random_state=seed)
+
+
+def engine_of(model):
+    # The engine name for a fitted model, or its class name if no engine builds it.
+    for name, (_, cls, _) in ENGINES.items():
+        if type(model).__name__ == cls:
+            return name
+    return type(model).__name__
+
+
+def single_threaded(model):
+    # For scoring workers that get their parallelism from a process pool. Forests fan out
+    # through joblib (n_jobs); boosted models through OpenMP, limited for this process.
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    else:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(1, user_api="openmp")
+    return model
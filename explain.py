@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from engines import single_threaded
+from scoring import FEATURES, MODEL_PATH, SCALER_PATH, load_artifacts
+from worker_pool import WorkerPool
+
+# Flagged rows explained per run, highest Fraud_Prob first.
+MAX_ROWS = 200
+# Rows per task sent to an explainer worker.
+BATCH_ROWS = 50
+# Cached attribution vectors (30 float32 values each) shared across sessions.
+CACHE_ROWS = 200_000
+# V* features shown as the reason for a flag.
+TOP_K = 3
+V_FEATURES = [i for i, col in enumerate(FEATURES) if col.startswith("V")]
+
+# --- Worker State ---
+# Each worker builds the TreeExplainer once from the saved artifacts.
+_explainer = None
+_scaler = None
+
+
+def _init_worker(model_path, scaler_path):
+    global _explainer, _scaler
+    import shap
+
+    model, _scaler = load_artifacts(model_path, scaler_path)
+    single_threaded(model)
+    _explainer = shap.TreeExplainer(model)
+
+
+def _explain_batch(X_raw):
+    import pandas as pd
+
+    X_scaled = _scaler.transform(pd.DataFrame(X_raw, columns=FEATURES))
+    values = np.asarray(_explainer.shap_values(X_scaled, check_additivity=False))
+    # Per-class output is (rows, features, classes) in recent shap, a list of arrays in older.
+    # Boosted models give a single (rows, features) array, in log-odds rather than probability.
+    if values.ndim == 3:
+        values = values[..., 1] if values.shape[-1] == 2 else values[1]
+    return values.astype(np.float32)
+
+
+def row_hashes(X_raw):
+    X_raw = np.ascontiguousarray(X_raw, dtype=np.float32)
+    return [hashlib.blake2b(row.tobytes(), digest_size=12).hexdigest() for row in X_raw]
+
+
+def top_features(attributions, k=TOP_K):
+    v = attributions[V_FEATURES]
+    order = np.argsort(-np.abs(v))[:k]
+    return ", ".join(f"{FEATURES[V_FEATURES[i]]} ({v[i]:+.3f})" for i in order)
+
+
+# --- Explainer ---
+class FraudExplainer:
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, max_workers=None, cache_rows=CACHE_ROWS):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.cache = OrderedDict()
+        self.cache_rows = cache_rows
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _pool(self):
+        if self.pool is None:
+            self.pool = WorkerPool(
+                self.max_workers, initializer=_init_worker, initargs=(self.model_path, self.scaler_path),
+            )
+        return self.pool
+
+    def explain(self, X_raw, model_version):
+        # Returns a (rows, features) attribution matrix toward the fraud class.
+        X_raw = np.asarray(X_raw, dtype=np.float64)
+        keys = [(model_version, h) for h in row_hashes(X_raw)]
+        out = np.zeros((len(X_raw), len(FEATURES)), dtype=np.float32)
+        with self.lock:
+            missing = []
+            for i, key in enumerate(keys):
+                hit = self.cache.get(key)
+                if hit is None:
+                    missing.append(i)
+                else:
+                    self.cache.move_to_end(key)
+                    out[i] = hit
+
+        if missing:
+            missing = np.asarray(missing)
+            batches = [missing[i:i + BATCH_ROWS] for i in range(0, len(missing), BATCH_ROWS)]
+            futures = [self._pool().submit(_explain_batch, X_raw[idx]) for idx in batches]
+            for idx, future in zip(batches, futures):
+                out[idx] = future.result()
+            with self.lock:
+                for i in missing:
+                    self.cache[keys[i]] = out[i].copy()
+                while len(self.cache) > self.cache_rows:
+                    self.cache.popitem(last=False)
+        return out
+
+    def explain_flagged(self, df, model_version, max_rows=MAX_ROWS):
+        # Explains the highest-probability flagged rows; returns them with a Top_Features column.
+        proba = df["Fraud_Prob"].to_numpy()
+        flagged = np.flatnonzero(df["Prediction"].to_numpy() == 1)
+        if len(flagged) > max_rows:
+            flagged = flagged[np.argpartition(-proba[flagged], max_rows - 1)[:max_rows]]
+        flagged = flagged[np.argsort(-proba[flagged], kind="stable")]
+        rows = df.iloc[flagged]
+        if rows.empty:
+            return rows.assign(Top_Features=[])
+        attributions = self.explain(rows[FEATURES].to_numpy(), model_version)
+        return rows.assign(Top_Features=[top_features(a) for a in attributions])
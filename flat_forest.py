@@ -0,0 +1,188 @@
+import argparse
+import time
+
+import numpy as np
+
+from engines import FOREST_ENGINES, engine_of
+from scoring import FEATURES, MODEL_PATH, SCALER_PATH, load_artifacts
+
+# Rows evaluated per block; bounds the (rows x trees) node-index matrix and keeps it cache-sized.
+BLOCK_ROWS = 2048
+# Largest allowed |flat - predict_proba| when verifying an export.
+TOLERANCE = 1e-6
+
+
+# --- Flat Forest ---
+# All trees of a fitted forest concatenated into contiguous node arrays. sklearn lays
+# trees out depth-first, so a split's left child is always the next node and only the
+# right child is stored. Leaves have threshold -inf and a right child pointing at
+# themselves, so every tree can be walked in lock-step for max_depth steps.
+class FlatForest:
+    def __init__(self, feature, threshold, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = self._predict_block(block)
+        return np.column_stack([1 - out, out])
+
+    def _predict_block(self, X):
+        n_rows, n_cols = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.int64) * n_cols)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            values = flat_X[row_offsets + self.feature[nodes]]
+            nodes = np.where(values <= self.threshold[nodes], nodes + 1, self.right[nodes])
+        return self.value[nodes].mean(axis=1)
+
+    def arrays(self):
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+        }
+
+
+def compile_forest(model, scaler=None):
+    if engine_of(model) not in FOREST_ENGINES:
+        raise ValueError(f"Only random forests can be flattened; this model's engine is {engine_of(model)}.")
+    positive = list(model.classes_).index(1)
+    features, thresholds, rights, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(n, dtype=np.int32)
+        if not np.array_equal(tree.children_left[~is_leaf], node_ids[~is_leaf] + 1):
+            raise ValueError("Tree is not in depth-first layout; cannot flatten.")
+
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+        threshold = tree.threshold.astype(np.float64)
+        if scaler is not None:
+            # (x - mean) / scale <= t  <=>  x <= t * scale + mean, since scale > 0
+            threshold = threshold * scaler.scale_[feature] + scaler.mean_[feature]
+        threshold = np.where(is_leaf, -np.inf, threshold)
+
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1)
+        value = np.divide(counts[:, positive], totals, out=np.zeros(n), where=totals > 0)
+
+        features.append(feature)
+        thresholds.append(threshold)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right).astype(np.int32) + offset)
+        values.append(value)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return FlatForest(
+        np.concatenate(features),
+        np.concatenate(thresholds),
+        np.concatenate(rights),
+        np.concatenate(values),
+        np.asarray(roots, dtype=np.int32),
+        max_depth,
+    )
+
+
+def load_flat_forest(path):
+    data = np.load(path)
+    return FlatForest(
+        data["feature"], data["threshold"], data["right"], data["value"], data["roots"], data["max_depth"]
+    )
+
+
+def max_abs_diff(model, scaler, flat, X):
+    import pandas as pd
+
+    expected = model.predict_proba(scaler.transform(pd.DataFrame(X, columns=FEATURES)))[:, 1]
+    return float(np.abs(flat.predict_proba(X)[:, 1] - expected).max())
+
+
+# --- Benchmark ---
+def synthetic_rows(scaler, n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, len(FEATURES))) * scaler.scale_ + scaler.mean_
+
+
+def _time_call(fn, X, min_seconds=0.5):
+    fn(X)  # warm-up
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn(X)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or len(X) * runs >= 1_000_000:
+            return elapsed / runs
+
+
+def benchmark(model, scaler, flat, batch_sizes=(1, 64, 4096, 1_000_000)):
+    import pandas as pd
+
+    def sklearn_path(X):
+        return model.predict_proba(scaler.transform(pd.DataFrame(X, columns=FEATURES)))[:, 1]
+
+    def flat_path(X):
+        return flat.predict_proba(X)[:, 1]
+
+    results = []
+    for size in batch_sizes:
+        X = synthetic_rows(scaler, size)
+        row = {"batch": size}
+        for name, fn in (("sklearn", sklearn_path), ("flat", flat_path)):
+            seconds = _time_call(fn, X)
+            row[f"{name}_ms"] = seconds * 1000
+            row[f"{name}_rows_per_sec"] = size / seconds
+        row["speedup"] = row["sklearn_ms"] / row["flat_ms"]
+        results.append(row)
+        print(f"  batch={size:>9,}  sklearn {row['sklearn_ms']:10.3f} ms  "
+              f"flat {row['flat_ms']:10.3f} ms  ({row['speedup']:.1f}x)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the fraud forest into flat arrays and benchmark it.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--out", default="model/flat_forest.npz")
+    parser.add_argument("--batch-sizes", default="1,64,4096,1000000")
+    parser.add_argument("--skip-bench", action="store_true")
+    args = parser.parse_args(argv)
+
+    model, scaler = load_artifacts(args.model, args.scaler)
+    flat = compile_forest(model, scaler)
+    np.savez(args.out, max_depth=flat.max_depth, **flat.arrays())
+    print(f"✅ Compiled {flat.n_trees} trees ({len(flat.feature):,} nodes) to {args.out}")
+
+    diff = max_abs_diff(model, scaler, flat, synthetic_rows(scaler, 20_000, seed=1))
+    print(f"🔍 Max |flat - predict_proba| on 20,000 rows: {diff:.2e}")
+    if diff > TOLERANCE:
+        raise SystemExit(f"❌ Flat forest disagrees with predict_proba by {diff:.2e} (> {TOLERANCE:.0e}).")
+
+    if not args.skip_bench:
+        print("⏱️ Benchmark:")
+        benchmark(model, scaler, flat, [int(b) for b in args.batch_sizes.split(",")])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard
+
+from scoring import CHUNK_SIZE, FEATURES, LABEL
+
+# --- Formats ---
+# Detected from the first bytes, so a renamed or extension-less upload still works.
+MAGIC = [(b"\x1f\x8b", "gzip"), (b"\x28\xb5\x2f\xfd", "zstd"), (b"PAR1", "parquet")]
+# Files commonly uploaded by mistake, named in the error; anything else with a NUL byte is binary.
+UNSUPPORTED = [(b"\x89PNG", "a PNG image"), (b"\xff\xd8\xff", "a JPEG image"), (b"GIF8", "a GIF image"),
+               (b"%PDF", "a PDF"), (b"PK\x03\x04", "a ZIP archive or Excel workbook"),
+               (b"\xd0\xcf\x11\xe0", "an Excel 97-2003 workbook")]
+# Bytes sniffed from the start of an upload.
+SNIFF_BYTES = 512
+# Rows parsed and coerced before the full read; a file none of whose sampled rows are usable fails fast.
+SAMPLE_ROWS = 1_000
+# Quarantined rows kept in memory (all of them are counted).
+MAX_QUARANTINE = 10_000
+
+
+def _wanted(col):
+    return col in FEATURES or col == LABEL
+
+
+def _rewind(source, pos=0):
+    if hasattr(source, "seek"):
+        source.seek(pos)
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def detect_format(source):
+    if hasattr(source, "read"):
+        pos = source.tell()
+        head = source.read(SNIFF_BYTES)
+        _rewind(source, pos)
+    else:
+        with open(source, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    fmt = next((fmt for magic, fmt in MAGIC if head.startswith(magic)), None)
+    if fmt is not None:
+        return fmt
+    kind = next((kind for magic, kind in UNSUPPORTED if head.startswith(magic)), None)
+    if kind is None and b"\x00" in head:
+        kind = "a binary file"
+    if kind is not None:
+        raise UnsupportedFormat(f"This looks like {kind}. Upload a CSV, gzip/zstd CSV or Parquet file.")
+    return "csv"
+
+
+def read_columns(source, fmt):
+    try:
+        if fmt == "parquet":
+            return list(pq.ParquetFile(source).schema_arrow.names)
+        return list(pd.read_csv(source, nrows=0, compression=None if fmt == "csv" else fmt).columns)
+    finally:
+        _rewind(source)
+
+
+# --- Quarantine ---
+# Rows that cannot be scored: a missing, non-numeric or non-finite feature. A label other than 0/1
+# does not stop a row being scored; it is kept as a missing (NA) label instead.
+# Each keeps its source line (CSV, header is line 1) or row number (Parquet) and the offending columns.
+class Quarantine:
+    def __init__(self, limit=MAX_QUARANTINE):
+        self.limit = limit
+        self.rows = 0
+        self.frames = []
+        self.kept = 0
+
+    def add(self, bad):
+        self.rows += len(bad)
+        if self.kept < self.limit:
+            self.frames.append(bad.iloc[:self.limit - self.kept])
+            self.kept += len(self.frames[-1])
+
+    def to_frame(self):
+        if not self.frames:
+            return pd.DataFrame(columns=["Line", "Reason"])
+        return pd.concat(self.frames, ignore_index=True)
+
+    @property
+    def nbytes(self):
+        return int(sum(f.memory_usage(deep=True).sum() for f in self.frames))
+
+
+def coerce_chunk(chunk, first_line, quarantine=None):
+    # Casts features to float32 (and the label to nullable Int8); unusable rows go to the quarantine.
+    columns = FEATURES + ([LABEL] if LABEL in chunk else [])
+    values, invalid = {}, {}
+    for col in columns:
+        column = chunk[col]
+        if not pd.api.types.is_numeric_dtype(column):
+            column = pd.to_numeric(column, errors="coerce")
+        column = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        if col == LABEL:
+            unknown = (column != 0) & (column != 1)
+            values[col] = pd.arrays.IntegerArray(np.where(unknown, 0, column).astype(np.int8), unknown)
+            continue
+        column = column.astype(np.float32)
+        bad = ~np.isfinite(column)
+        values[col] = column
+        if bad.any():
+            invalid[col] = bad
+
+    df = pd.DataFrame(values)
+    if not invalid:
+        return df
+    bad = np.logical_or.reduce(list(invalid.values()))
+    rows = np.flatnonzero(bad)
+    if quarantine is not None:
+        reasons = [", ".join(col for col, mask in invalid.items() if mask[i]) for i in rows]
+        quarantine.add(chunk.iloc[rows][columns].astype(str).assign(Line=first_line + rows, Reason=reasons))
+    return df[~bad].reset_index(drop=True)
+
+
+def iter_chunks(source, chunksize=CHUNK_SIZE, quarantine=None):
+    # Yields clean, typed frames of FEATURES (+ LABEL when present) from CSV, gzip/zstd CSV or Parquet.
+    fmt = detect_format(source)
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(source)
+        columns = [col for col in parquet.schema_arrow.names if _wanted(col)]
+        batches = (b.to_pandas() for b in parquet.iter_batches(batch_size=chunksize, columns=columns))
+        first_line = 1
+    else:
+        batches = pd.read_csv(source, usecols=_wanted, chunksize=chunksize,
+                              compression=None if fmt == "csv" else fmt)
+        first_line = 2
+    for chunk in batches:
+        df = coerce_chunk(chunk, first_line, quarantine)
+        first_line += len(chunk)
+        if len(df):
+            yield df
+
+
+# --- Upfront Validation ---
+# Raised reading a file that is not what it claims to be: undecodable text, a malformed
+# or empty CSV, a corrupt gzip/zstd stream or Parquet footer (ZstdError is not an OSError).
+READ_ERRORS = (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError, pa.ArrowInvalid,
+               OSError, EOFError, zstandard.ZstdError, UnsupportedFormat)
+
+
+class Validation:
+    def __init__(self, fmt, missing, sample_rows, quarantine, error=None):
+        self.fmt = fmt
+        self.missing = missing
+        self.sample_rows = sample_rows
+        self.quarantine = quarantine
+        # Why the file could not be read at all; set instead of raising, for the app to report.
+        self.error = error
+
+    @property
+    def unreadable(self):
+        # Every sampled row failed coercion: almost certainly the wrong file or a broken export.
+        return self.sample_rows > 0 and self.quarantine.rows == self.sample_rows
+
+
+def read_sample(source, fmt, rows):
+    try:
+        if fmt == "parquet":
+            parquet = pq.ParquetFile(source)
+            batch = next(parquet.iter_batches(batch_size=rows), None)
+            return (batch or parquet.schema_arrow.empty_table()).to_pandas()
+        return pd.read_csv(source, nrows=rows, usecols=_wanted,
+                           compression=None if fmt == "csv" else fmt)
+    finally:
+        _rewind(source)
+
+
+def _read_error(exc, fmt):
+    if isinstance(exc, UnsupportedFormat):
+        return str(exc)
+    if isinstance(exc, pd.errors.EmptyDataError):
+        return "The file is empty."
+    if isinstance(exc, UnicodeDecodeError):
+        return "The file is not UTF-8 text. Upload a CSV, gzip/zstd CSV or Parquet file."
+    return f"The file could not be read as {fmt}: {exc}"
+
+
+def validate(source, sample_rows=SAMPLE_ROWS):
+    # Checks the header and coerces the first sample_rows rows without reading the rest of the file.
+    # Wrong-type, empty and corrupt files come back with .error set rather than raising.
+    quarantine = Quarantine()
+    fmt = None
+    try:
+        fmt = detect_format(source)
+        missing = [col for col in FEATURES if col not in read_columns(source, fmt)]
+        if missing:
+            return Validation(fmt, missing, 0, quarantine)
+        sample = read_sample(source, fmt, sample_rows)
+    except READ_ERRORS as exc:
+        _rewind(source)
+        return Validation(fmt, [], 0, quarantine, error=_read_error(exc, fmt))
+    coerce_chunk(sample, 1 if fmt == "parquet" else 2, quarantine)
+    return Validation(fmt, missing, len(sample), quarantine)
+
+
+def stem(path):
+    # File name without its data and compression extensions: "day1.csv.gz" -> "day1".
+    name = os.path.basename(path)
+    for ext in (".gz", ".zst", ".parquet", ".csv"):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    return name
@@ -0,0 +1,165 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+def payload_bytes(out):
+    # Size of a str/bytes payload, or of a file object, which is left rewound to its start.
+    if hasattr(out, "seek"):
+        size = out.seek(0, os.SEEK_END)
+        out.seek(0)
+        return size
+    return len(out)
+
+
+# --- Stage Instrumentation ---
+# One StageTimer per page render. Stages (parse, scale, predict, store, each chart, ...)
+# accumulate wall time, rows and bytes, are shown in the app's timing panel and are
+# appended as JSON lines to LOG_PATH, one line per stage, for log shippers to scrape.
+LOG_PATH = "logs/stages.jsonl"
+PROFILE_DIR = "logs/profiles"
+# Seconds between stack samples taken by the admin profiler.
+SAMPLE_INTERVAL = 0.005
+# Stack frames kept per sample, innermost first.
+MAX_DEPTH = 64
+
+_log_lock = threading.Lock()
+
+
+def log_event(event, path=LOG_PATH):
+    line = json.dumps({"ts": datetime.now().isoformat(timespec="milliseconds"), **event})
+    with _log_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+
+def stage(timer, name, rows=0):
+    # Times a stage when a timer is given; a no-op otherwise, so library code can take timer=None.
+    return timer.stage(name, rows) if timer is not None else nullcontext({"rows": rows, "bytes": 0})
+
+
+class StageTimer:
+    def __init__(self, page, user=None, log_path=LOG_PATH):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.page = page
+        self.user = user
+        self.log_path = log_path
+        self.stages = {}
+        self.started = self.last = time.perf_counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        record = {"rows": rows, "bytes": 0}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.last = time.perf_counter()
+            self.add(name, self.last - start, record["rows"], record["bytes"])
+
+    def mark(self):
+        self.last = time.perf_counter()
+
+    def lap(self, name, rows=0, nbytes=0):
+        # Records the time since the previous stage, lap or mark; for straight-line page code.
+        now = time.perf_counter()
+        self.add(name, now - self.last, rows, nbytes)
+        self.last = now
+
+    def add(self, name, seconds=0.0, rows=0, nbytes=0, calls=1):
+        with self.lock:
+            totals = self.stages.setdefault(name, {"seconds": 0.0, "rows": 0, "bytes": 0, "calls": 0})
+            totals["seconds"] += seconds
+            totals["rows"] += rows
+            totals["bytes"] += nbytes
+            totals["calls"] += calls
+
+    def deferred(self, name, fn):
+        # Wraps work that runs after this render (e.g. a download built on click); it logs itself.
+        def run():
+            start = time.perf_counter()
+            out = fn()
+            self._log(name, {"seconds": time.perf_counter() - start, "rows": 0, "bytes": payload_bytes(out),
+                             "calls": 1})
+            return out
+        return run
+
+    def _log(self, name, totals):
+        log_event({"request_id": self.request_id, "page": self.page, "user": self.user, "stage": name,
+                   **{k: round(v, 6) if isinstance(v, float) else v for k, v in totals.items()}}, self.log_path)
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def rows(self):
+        with self.lock:
+            return [{"stage": name, **totals} for name, totals in self.stages.items()]
+
+    def flush(self):
+        for row in self.rows():
+            self._log(row.pop("stage"), row)
+        self._log("total", {"seconds": self.total_seconds, "rows": 0, "bytes": 0, "calls": 1})
+
+
+# --- Sampling Profiler ---
+# A background thread samples the target thread's Python stack every SAMPLE_INTERVAL
+# seconds. Cost is independent of how many functions run, unlike a tracing profiler.
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    @property
+    def total(self):
+        return sum(self.samples.values())
+
+    def top(self, n=25):
+        # (function, self %, total %) for the functions seen in the most samples.
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for fn in set(stack):
+                inclusive[fn] += count
+        total = max(self.total, 1)
+        return [(fn, 100 * own[fn] / total, 100 * count / total) for fn, count in inclusive.most_common(n)]
+
+    def save(self, name, directory=PROFILE_DIR):
+        # Collapsed stacks ("outer;inner count"), the input format of flame graph tools.
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.folded")
+        with open(path, "w") as f:
+            for stack, count in self.samples.items():
+                f.write(f"{';'.join(stack)} {count}\n")
+        return path
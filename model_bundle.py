@@ -0,0 +1,150 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from flat_forest import FlatForest, compile_forest
+from scoring import FEATURES, MODEL_PATH, SCALER_PATH
+
+# --- Bundle Format ---
+# A bundle is a directory holding one raw .npy file per array plus manifest.json.
+# Loading memory-maps the arrays read-only, so every worker process on a host shares
+# the same page-cache copy of the model instead of unpickling its own.
+BUNDLE_FORMAT = 1
+BUNDLE_PATH = "model/bundle"
+FOREST_ARRAYS = ("feature", "threshold", "right", "value", "roots")
+SCALER_ARRAYS = ("scaler_mean", "scaler_scale")
+
+
+class ModelBundle:
+    def __init__(self, forest, scaler_mean, scaler_scale, manifest):
+        self.forest = forest
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.manifest = manifest
+
+    @property
+    def version(self):
+        return self.manifest["model_version"]
+
+    def predict_proba(self, X):
+        # Scaler is folded into the forest thresholds; X is raw FEATURES order.
+        return self.forest.predict_proba(X)
+
+
+def save_bundle(model, scaler, path=BUNDLE_PATH):
+    forest = compile_forest(model, scaler)
+    arrays = dict(forest.arrays())
+    arrays["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+    arrays["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+
+    digest = hashlib.sha256()
+    os.makedirs(path, exist_ok=True)
+    for name in FOREST_ARRAYS + SCALER_ARRAYS:
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(name.encode())
+        digest.update(array.tobytes())
+        np.save(os.path.join(path, f"{name}.npy"), array)
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "model_version": digest.hexdigest()[:16],
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "features": FEATURES,
+        "n_trees": forest.n_trees,
+        "n_nodes": int(len(forest.feature)),
+        "max_depth": forest.max_depth,
+        "model_class": type(model).__name__,
+    }
+    # Manifest is written last, so a bundle without one is incomplete.
+    tmp = os.path.join(path, "manifest.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, "manifest.json"))
+    return manifest
+
+
+def load_bundle(path=BUNDLE_PATH, mmap=True):
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {manifest.get('format')} in {path}")
+    if manifest["features"] != FEATURES:
+        raise ValueError(f"Bundle in {path} was built for a different feature schema")
+
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+              for name in FOREST_ARRAYS + SCALER_ARRAYS}
+    forest = FlatForest(*(arrays[name] for name in FOREST_ARRAYS), manifest["max_depth"])
+    return ModelBundle(forest, arrays["scaler_mean"], arrays["scaler_scale"], manifest)
+
+
+# --- Startup / Memory Measurement ---
+# Each probe runs in a fresh interpreter and reports wall time and memory after loading.
+_PROBE = r"""
+import sys, time, json
+start = time.perf_counter()
+exec(sys.argv[1])
+elapsed = time.perf_counter() - start
+mem = {}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if key in ("Rss", "Pss", "Shared_Clean", "Private_Clean", "Private_Dirty"):
+            mem[key] = int(value.split()[0])
+print(json.dumps({"seconds": elapsed, **mem}))
+"""
+
+PROBES = {
+    "joblib pickle": "import joblib; m = joblib.load({model!r}); s = joblib.load({scaler!r})",
+    "mmap bundle": "from model_bundle import load_bundle; b = load_bundle({bundle!r})",
+    "app imports (eager)": "import streamlit, pandas, seaborn, matplotlib.pyplot, plotly.express, fpdf, shap, "
+                           "sklearn.linear_model, sklearn.ensemble, sklearn.metrics",
+    "app imports (lazy)": "import streamlit, pandas, numpy",
+}
+
+
+def measure(model_path=MODEL_PATH, scaler_path=SCALER_PATH, bundle_path=BUNDLE_PATH):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(os.path.abspath(__file__)),
+                                                       os.environ.get("PYTHONPATH", "")]))
+    results = {}
+    for name, code in PROBES.items():
+        code = code.format(model=model_path, scaler=scaler_path, bundle=bundle_path)
+        proc = subprocess.run([sys.executable, "-W", "ignore", "-c", _PROBE, code],
+                              capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            print(f"  {name:<22} failed: {proc.stderr.strip().splitlines()[-1]}")
+            continue
+        results[name] = json.loads(proc.stdout)
+        r = results[name]
+        print(f"  {name:<22} {r['seconds']:7.3f} s   RSS {r['Rss'] / 1024:7.1f} MB   "
+              f"private {(r['Private_Clean'] + r['Private_Dirty']) / 1024:7.1f} MB")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the fraud model as a memory-mappable bundle.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--out", default=BUNDLE_PATH)
+    parser.add_argument("--measure", action="store_true", help="compare startup time and memory per worker")
+    args = parser.parse_args(argv)
+
+    from scoring import load_artifacts
+
+    model, scaler = load_artifacts(args.model, args.scaler)
+    manifest = save_bundle(model, scaler, args.out)
+    print(f"✅ Bundle {manifest['model_version']} ({manifest['n_trees']} trees) saved to {args.out}")
+
+    if args.measure:
+        print("⏱️ Cold start per worker:")
+        measure(args.model, args.scaler, args.out)
+
+
+if __name__ == "__main__":
+    main()
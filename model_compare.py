@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from worker_pool import WorkerPool
+
+# --- Candidates ---
+# name -> (module, class, hyperparameters); imported inside the worker process.
+CANDIDATES = {
+    "Logistic Regression": ("sklearn.linear_model", "LogisticRegression", {"max_iter": 1000}),
+    "Random Forest": ("sklearn.ensemble", "RandomForestClassifier",
+                      {"n_estimators": 100, "n_jobs": -1, "random_state": 42}),
+    "Histogram Gradient Boosting": ("sklearn.ensemble", "HistGradientBoostingClassifier",
+                                    {"early_stopping": False, "random_state": 42}),
+}
+# Fraction of the latest transactions (by Time) held out for evaluation.
+TEST_FRACTION = 0.3
+# Fitted candidates kept in memory across sessions.
+CACHE_ENTRIES = 8
+
+
+def time_split(X, y, time_col, test_fraction=TEST_FRACTION):
+    # Train on the earliest transactions, evaluate on the latest: no look-ahead.
+    order = np.argsort(time_col, kind="stable")
+    cut = int(len(order) * (1 - test_fraction))
+    train, test = order[:cut], order[cut:]
+    return X[train], X[test], y[train], y[test]
+
+
+def data_hash(*arrays):
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def fit_candidate(name, module, cls, params, X_train, y_train, X_test, y_test):
+    import importlib
+    from sklearn.metrics import accuracy_score, average_precision_score, classification_report, confusion_matrix
+
+    model = getattr(importlib.import_module(module), cls)(**params)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proba = model.predict_proba(X_test)[:, 1]
+    predict_seconds = time.perf_counter() - start
+    y_pred = (proba >= 0.5).astype(int)
+
+    blob = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+    both_classes = len(np.unique(y_test)) > 1
+    return {
+        "name": name,
+        "params": params,
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "auc_pr": float(average_precision_score(y_test, proba)) if both_classes else None,
+        "conf_matrix": confusion_matrix(y_test, y_pred, labels=[0, 1]).tolist(),
+        "report": classification_report(y_test, y_pred, output_dict=True, zero_division=0),
+        "train_seconds": train_seconds,
+        "rows_per_sec": len(X_test) / max(predict_seconds, 1e-9),
+        "model_bytes": len(blob),
+        "model": blob,
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+    }
+
+
+# --- Comparison Engine ---
+# Fits run in a process pool (worker_pool.WorkerPool) shared by all sessions, so the Streamlit
+# request thread only waits on futures and streams progress. Results (including the
+# pickled fitted model) are cached by (data hash, candidate, hyperparameters).
+class ModelComparison:
+    def __init__(self, max_workers=None, cache_entries=CACHE_ENTRIES):
+        self.max_workers = max_workers or min(len(CANDIDATES), os.cpu_count() or 1)
+        self.cache = OrderedDict()
+        self.cache_entries = cache_entries
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _pool(self):
+        if self.pool is None:
+            self.pool = WorkerPool(self.max_workers)
+        return self.pool
+
+    def _key(self, digest, name, params):
+        return (digest, name, json.dumps(params, sort_keys=True))
+
+    def run(self, X, y, time_col, candidates=CANDIDATES):
+        # Yields (completed, total, result) as each candidate finishes, cached ones first.
+        X_train, X_test, y_train, y_test = time_split(X, y, time_col)
+        digest = data_hash(X_train, y_train, X_test, y_test)
+        total = len(candidates)
+        cached, futures = [], {}
+        for name, (module, cls, params) in candidates.items():
+            key = self._key(digest, name, params)
+            with self.lock:
+                hit = self.cache.get(key)
+            if hit is not None:
+                cached.append(hit)
+            else:
+                future = self._pool().submit(fit_candidate, name, module, cls, params,
+                                             X_train, y_train, X_test, y_test)
+                futures[future] = key
+
+        done = 0
+        for result in cached:
+            done += 1
+            yield done, total, {**result, "cached": True}
+        for future in as_completed(futures):
+            result = future.result()
+            with self.lock:
+                self.cache[futures[future]] = result
+                while len(self.cache) > self.cache_entries:
+                    self.cache.popitem(last=False)
+            done += 1
+            yield done, total, {**result, "cached": False}
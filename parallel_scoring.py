@@ -0,0 +1,105 @@
+import os
+import threading
+from concurrent.futures import wait
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from engines import single_threaded
+from scoring import FEATURES, MODEL_PATH, SCALER_PATH, load_artifacts
+from worker_pool import WorkerPool
+
+# Worker processes for one upload; each scores its blocks single-threaded.
+WORKERS = int(os.environ.get("FRAUD_SCORING_WORKERS", 0)) or os.cpu_count() or 1
+# Below this many rows the pool's fixed cost outweighs the split; score in-process instead.
+MIN_PARALLEL_ROWS = 20_000
+# Blocks per worker, so a slow block does not leave the other workers idle at the end.
+BLOCKS_PER_WORKER = 4
+
+# --- Worker State ---
+_model = None
+_mean = None
+_scale = None
+
+
+def _init_worker(model_path, scaler_path):
+    global _model, _mean, _scale
+    _model, scaler = load_artifacts(model_path, scaler_path)
+    single_threaded(_model)
+    _mean = scaler.mean_.astype(np.float32)
+    _scale = scaler.scale_.astype(np.float32)
+
+
+def _score_block(in_name, out_name, rows, start, stop):
+    # Spawned workers share the parent's resource tracker, so attaching here does not claim the segments.
+    shm_in, shm_out = SharedMemory(in_name), SharedMemory(out_name)
+    X = out = None
+    try:
+        X = np.ndarray((rows, len(FEATURES)), dtype=np.float32, buffer=shm_in.buf)[start:stop]
+        out = np.ndarray((rows,), dtype=np.float64, buffer=shm_out.buf)
+        # Scale in place: the input block is scratch space owned by this call.
+        X -= _mean
+        X /= _scale
+        out[start:stop] = _model.predict_proba(X)[:, 1]
+    finally:
+        X = out = None
+        shm_in.close()
+        shm_out.close()
+
+
+# --- Parallel Scorer ---
+# The feature matrix is written once into a shared-memory segment, column by column
+# straight from the frame; workers read their row blocks from it in place and write
+# probabilities into one shared output array, so no rows are pickled and no per-worker
+# results are concatenated.
+class ParallelScorer:
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, workers=WORKERS,
+                 min_parallel_rows=MIN_PARALLEL_ROWS):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.workers = workers
+        self.min_parallel_rows = min_parallel_rows
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = WorkerPool(
+                    self.workers, initializer=_init_worker, initargs=(self.model_path, self.scaler_path),
+                )
+            return self.pool
+
+    def blocks(self, rows):
+        count = min(self.workers * BLOCKS_PER_WORKER, max(rows // 1024, 1))
+        edges = np.linspace(0, rows, count + 1).astype(np.int64)
+        return list(zip(edges[:-1], edges[1:]))
+
+    def predict_proba(self, df, model, scaler):
+        # Fraud probability per row of df[FEATURES]; model/scaler score small frames in-process.
+        rows = len(df)
+        if self.workers <= 1 or rows < self.min_parallel_rows:
+            return model.predict_proba(scaler.transform(df[FEATURES]))[:, 1]
+
+        shm_in = SharedMemory(create=True, size=rows * len(FEATURES) * 4)
+        shm_out = SharedMemory(create=True, size=rows * 8)
+        X = None
+        try:
+            X = np.ndarray((rows, len(FEATURES)), dtype=np.float32, buffer=shm_in.buf)
+            for j, col in enumerate(FEATURES):
+                X[:, j] = df[col].to_numpy()
+            futures = [self._pool().submit(_score_block, shm_in.name, shm_out.name, rows, start, stop)
+                       for start, stop in self.blocks(rows)]
+            wait(futures)
+            for future in futures:
+                future.result()
+            # The only copy of the results: out of the segment before it is released.
+            proba = np.frombuffer(shm_out.buf, dtype=np.float64, count=rows).copy()
+        finally:
+            # Views must be dropped before the segment can be closed.
+            X = None
+            shm_in.close()
+            shm_in.unlink()
+            shm_out.close()
+            shm_out.unlink()
+        return proba
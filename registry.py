@@ -0,0 +1,327 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from drift import BASELINE_PATH
+from instrument import log_event
+from scoring import FEATURES, MODEL_PATH, SCALER_PATH, artifact_version, load_artifacts
+
+# --- Model Registry ---
+# Each registered version is a directory REGISTRY_ROOT/<version>/ holding its model,
+# scaler, drift baseline and meta.json; versions are never modified after registration.
+# Two pointer files name the version that serves traffic (ACTIVE) and an optional one
+# that is shadow-scored beside it (CANDIDATE). Pointers are replaced atomically, and
+# running processes notice the change within CHECK_SECONDS and swap without restarting.
+# With no ACTIVE pointer the fixed MODEL_PATH / SCALER_PATH artifacts are served as before.
+REGISTRY_ROOT = "model/registry"
+ROLES = ("active", "candidate")
+# Seconds between pointer checks in a running process.
+CHECK_SECONDS = 5.0
+SHADOW_PATH = "monitoring/shadow.jsonl"
+# Batches waiting for the candidate before new ones are skipped, so shadowing never builds a backlog.
+SHADOW_PENDING = 4
+
+Deployment = namedtuple("Deployment", "version model scaler model_path scaler_path")
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_ROOT):
+        self.root = root
+
+    def _pointer(self, role):
+        return os.path.join(self.root, role.upper())
+
+    def paths(self, version):
+        directory = os.path.join(self.root, version)
+        return (os.path.join(directory, os.path.basename(MODEL_PATH)),
+                os.path.join(directory, os.path.basename(SCALER_PATH)))
+
+    def register(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, baseline_path=BASELINE_PATH, note=""):
+        digest = artifact_version(model_path, scaler_path)
+        base = f"{datetime.now():%Y%m%d-%H%M%S}-{digest[:8]}"
+        # Copied into a scratch directory and renamed into place, so a version is complete or absent.
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{base}.", suffix=".tmp", dir=self.root)
+        shutil.copy2(model_path, os.path.join(tmp, os.path.basename(MODEL_PATH)))
+        shutil.copy2(scaler_path, os.path.join(tmp, os.path.basename(SCALER_PATH)))
+        if baseline_path and os.path.exists(baseline_path):
+            shutil.copy2(baseline_path, os.path.join(tmp, os.path.basename(BASELINE_PATH)))
+        # Ids have one-second resolution; a registration that finds its id taken by another in
+        # the same second (even of the same artifacts) takes the next -1, -2, ... suffix.
+        for attempt in itertools.count():
+            version = base if attempt == 0 else f"{base}-{attempt}"
+            meta = {"version": version, "created": datetime.now().isoformat(timespec="seconds"),
+                    "artifact_version": digest, "note": note}
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            try:
+                os.rename(tmp, os.path.join(self.root, version))
+                return version
+            except OSError:
+                if not os.path.exists(os.path.join(self.root, version)):
+                    raise
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        metas = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name, "meta.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    metas.append(json.load(f))
+        return metas
+
+    def get(self, role):
+        # The version a pointer names, or None.
+        path = self._pointer(role)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)["version"]
+
+    def set(self, role, version):
+        if version is None:
+            if os.path.exists(self._pointer(role)):
+                os.remove(self._pointer(role))
+            return
+        if not os.path.exists(os.path.join(self.root, version, "meta.json")):
+            raise ValueError(f"Unknown model version: {version}")
+        tmp = f"{self._pointer(role)}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": version, "updated": datetime.now().isoformat(timespec="seconds")}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._pointer(role))
+
+    def promote(self, version):
+        self.set("active", version)
+        # A promoted candidate has nothing left to be compared with.
+        if self.get("candidate") == version:
+            self.set("candidate", None)
+
+
+# --- Live Model ---
+# One per process. current() returns the active Deployment; callers take it once per
+# request or upload so every batch in it is scored by the same version. A new version is
+# loaded on a background thread while the old one keeps serving, then swapped in with a
+# single assignment.
+class LiveModel:
+    def __init__(self, registry=None, check_seconds=CHECK_SECONDS):
+        self.registry = registry or ModelRegistry()
+        self.check_seconds = check_seconds
+        self.deployments = {role: None for role in ROLES}
+        self.loading = set()
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def _load(self, role, version):
+        try:
+            if version is None:
+                model_path, scaler_path, version = MODEL_PATH, SCALER_PATH, artifact_version()
+            else:
+                model_path, scaler_path = self.registry.paths(version)
+            model, scaler = load_artifacts(model_path, scaler_path)
+            deployment = Deployment(version, model, scaler, model_path, scaler_path)
+            with self.lock:
+                self.deployments[role] = deployment
+            print(f"🔁 {role.capitalize()} model is now {version}")
+        except Exception as exc:
+            # The previous version keeps serving; the load is retried at the next check.
+            print(f"⚠️ Could not load {role} model {version}: {exc}")
+        finally:
+            with self.lock:
+                self.loading.discard(role)
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.checked is not None and now - self.checked < self.check_seconds:
+                return
+            self.checked = now
+        for role in ROLES:
+            version = self.registry.get(role)
+            with self.lock:
+                current = self.deployments[role]
+                if role == "candidate" and version is None:
+                    self.deployments[role] = None
+                    continue
+                # Without an ACTIVE pointer the fixed artifacts, once loaded, keep serving.
+                if role in self.loading or (current is not None and (version is None or current.version == version)):
+                    continue
+                self.loading.add(role)
+            if current is None and role == "active":
+                # Nothing to serve yet: the first load blocks.
+                self._load(role, version)
+            else:
+                threading.Thread(target=self._load, args=(role, version), name=f"load-{role}", daemon=True).start()
+
+    def current(self):
+        self._refresh()
+        return self.deployments["active"]
+
+    def candidate(self):
+        self._refresh()
+        active, candidate = self.deployments["active"], self.deployments["candidate"]
+        return candidate if candidate is not None and (active is None or candidate.version != active.version) else None
+
+
+# --- Shadow Scoring ---
+# The candidate re-scores every batch the active model scored, on a background thread,
+# so it adds no latency to the primary result. Per (active, candidate) pair it tracks how
+# often the two disagree at the caller's threshold and both models' latency; each batch is
+# also appended to SHADOW_PATH.
+def _latency(values):
+    arr = np.fromiter(values, dtype=np.float64)
+    p50, p99 = np.percentile(arr, [50, 99]) if arr.size else (0.0, 0.0)
+    return {"p50": round(float(p50), 3), "p99": round(float(p99), 3)}
+
+
+class ShadowMonitor:
+    def __init__(self, log_path=SHADOW_PATH, max_pending=SHADOW_PENDING, window=10_000):
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self.log_path = log_path
+        self.max_pending = max_pending
+        self.window = window
+        self.pending = 0
+        self.pairs = {}
+        self.lock = threading.Lock()
+
+    def _pair(self, primary, candidate):
+        return self.pairs.setdefault((primary, candidate), {
+            "batches": 0, "rows": 0, "skipped_batches": 0, "disagreements": 0, "candidate_only": 0,
+            "primary_only": 0, "abs_diff_sum": 0.0, "max_abs_diff": 0.0,
+            "primary_ms": deque(maxlen=self.window), "candidate_ms": deque(maxlen=self.window),
+            "primary_rows_sec": deque(maxlen=self.window), "candidate_rows_sec": deque(maxlen=self.window),
+        })
+
+    def observe(self, primary_version, candidate, X, primary_proba, primary_ms, threshold):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self._pair(primary_version, candidate.version)["skipped_batches"] += 1
+                return None
+            self.pending += 1
+        return self.pool.submit(self._score, primary_version, candidate, X, primary_proba, primary_ms, threshold)
+
+    def _score(self, primary_version, candidate, X, primary_proba, primary_ms, threshold):
+        try:
+            X = X[FEATURES].to_numpy(dtype=np.float64) if hasattr(X, "columns") else np.asarray(X, dtype=np.float64)
+            start = time.perf_counter()
+            proba = candidate.model.predict_proba((X - candidate.scaler.mean_) / candidate.scaler.scale_)[:, 1]
+            candidate_ms = (time.perf_counter() - start) * 1000
+
+            primary_flag, candidate_flag = primary_proba >= threshold, proba >= threshold
+            diff = np.abs(proba - primary_proba)
+            batch = {"primary": primary_version, "candidate": candidate.version, "rows": len(X),
+                     "threshold": threshold, "disagreements": int((primary_flag != candidate_flag).sum()),
+                     "candidate_only": int((candidate_flag & ~primary_flag).sum()),
+                     "primary_only": int((primary_flag & ~candidate_flag).sum()),
+                     "mean_abs_diff": round(float(diff.mean()), 6) if len(diff) else 0.0,
+                     "primary_ms": round(primary_ms, 3), "candidate_ms": round(candidate_ms, 3)}
+            with self.lock:
+                totals = self._pair(primary_version, candidate.version)
+                totals["batches"] += 1
+                totals["rows"] += len(X)
+                for key in ("disagreements", "candidate_only", "primary_only"):
+                    totals[key] += batch[key]
+                totals["abs_diff_sum"] += float(diff.sum())
+                totals["max_abs_diff"] = max(totals["max_abs_diff"], float(diff.max()) if len(diff) else 0.0)
+                totals["primary_ms"].append(primary_ms)
+                totals["candidate_ms"].append(candidate_ms)
+                totals["primary_rows_sec"].append(len(X) / max(primary_ms / 1000, 1e-9))
+                totals["candidate_rows_sec"].append(len(X) / max(candidate_ms / 1000, 1e-9))
+            log_event({"page": "shadow", **batch}, self.log_path)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def snapshot(self):
+        with self.lock:
+            out = []
+            for (primary, candidate), t in self.pairs.items():
+                rows = max(t["rows"], 1)
+                out.append({
+                    "primary": primary, "candidate": candidate, "batches": t["batches"], "rows": t["rows"],
+                    "skipped_batches": t["skipped_batches"],
+                    "disagreement_rate": round(t["disagreements"] / rows, 6),
+                    "candidate_only": t["candidate_only"], "primary_only": t["primary_only"],
+                    "mean_abs_diff": round(t["abs_diff_sum"] / rows, 6), "max_abs_diff": round(t["max_abs_diff"], 6),
+                    "primary_ms": _latency(t["primary_ms"]), "candidate_ms": _latency(t["candidate_ms"]),
+                    "primary_rows_per_sec": round(float(np.median(t["primary_rows_sec"])), 1) if t["batches"] else 0.0,
+                    "candidate_rows_per_sec": round(float(np.median(t["candidate_rows_sec"])), 1) if t["batches"] else 0.0,
+                })
+            return out
+
+
+class ShadowedScorer:
+    # The scorer interface of scoring.score_frame: returns the active model's scores (through
+    # an inner scorer if given) and hands the same rows to the candidate in the background.
+    def __init__(self, monitor, primary_version, candidate, threshold, scorer=None):
+        self.monitor = monitor
+        self.primary_version = primary_version
+        self.candidate = candidate
+        self.threshold = threshold
+        self.scorer = scorer
+
+    def predict_proba(self, df, model, scaler):
+        start = time.perf_counter()
+        if self.scorer is not None:
+            proba = self.scorer.predict_proba(df, model, scaler)
+        else:
+            proba = model.predict_proba(scaler.transform(df[FEATURES]))[:, 1]
+        self.monitor.observe(self.primary_version, self.candidate, df, proba,
+                             (time.perf_counter() - start) * 1000, self.threshold)
+        return proba
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Register, promote and shadow-test model versions.")
+    parser.add_argument("--root", default=REGISTRY_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="registered versions and the active / candidate pointers")
+    register = sub.add_parser("register", help="copy trained artifacts into the registry as a new version")
+    register.add_argument("--model", default=MODEL_PATH)
+    register.add_argument("--scaler", default=SCALER_PATH)
+    register.add_argument("--note", default="")
+    register.add_argument("--as", dest="role", choices=ROLES, help="also point active or candidate at it")
+    promote = sub.add_parser("promote", help="make a version active in all running processes")
+    promote.add_argument("version")
+    candidate = sub.add_parser("candidate", help="shadow-score a version beside the active one ('none' stops)")
+    candidate.add_argument("version")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    if args.command == "list":
+        active, cand = registry.get("active"), registry.get("candidate")
+        for meta in registry.versions():
+            tag = " ✅ active" if meta["version"] == active else " 🕶️ candidate" if meta["version"] == cand else ""
+            print(f"{meta['version']}  {meta['created']}  {meta.get('note', '')}{tag}")
+        if active is None:
+            print(f"No active version; serving {MODEL_PATH}")
+    elif args.command == "register":
+        version = registry.register(args.model, args.scaler, note=args.note)
+        if args.role == "active":
+            registry.promote(version)
+        elif args.role == "candidate":
+            registry.set("candidate", version)
+        print(f"✅ Registered {version}" + (f" as {args.role}" if args.role else ""))
+    elif args.command == "promote":
+        registry.promote(args.version)
+        print(f"✅ {args.version} is now active")
+    else:
+        registry.set("candidate", None if args.version.lower() == "none" else args.version)
+        print(f"✅ Candidate set to {args.version}")
+
+
+if __name__ == "__main__":
+    main()
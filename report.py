@@ -0,0 +1,125 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from instrument import log_event
+
+# Reports rendered concurrently for all sessions of one server process.
+REPORT_WORKERS = 2
+# Finished (or in-flight) reports kept per (run, user, threshold); each is ~100 KB.
+REPORT_MEMO = 16
+# Highest-probability rows listed in the report.
+REPORT_ROWS = 10
+COLORS = {0: "green", 1: "red"}
+NAMES = {0: "Legit", 1: "Fraud"}
+
+
+# --- PDF Layout ---
+def make_pdf():
+    from fpdf import FPDF
+
+    class PDF(FPDF):
+        def header(self):
+            self.set_font("helvetica", "B", 14)
+            self.cell(0, 10, "Fraud Detection Report", new_x="LMARGIN", new_y="NEXT", align="C")
+        def footer(self):
+            self.set_y(-15)
+            self.set_font("helvetica", "I", 8)
+            self.cell(0, 10, f"Page {self.page_no()}", align="C")
+
+    return PDF()
+
+
+def line(pdf, text, height=8):
+    pdf.cell(0, height, text, new_x="LMARGIN", new_y="NEXT")
+
+
+# --- Charts ---
+# Drawn with the object-oriented matplotlib API (no pyplot state), so workers can render in parallel.
+def bar_chart(counts, labels, title, xlabel):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 3.2))
+    ax = fig.add_subplot()
+    x = np.arange(len(labels))
+    for k, offset in ((0, -0.2), (1, 0.2)):
+        ax.bar(x + offset, counts[:, k], width=0.4, color=COLORS[k], label=NAMES[k])
+    ax.set_xticks(x, labels, fontsize=8)
+    ax.set_yscale("symlog")
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.legend()
+    fig.tight_layout()
+    out = io.BytesIO()
+    fig.savefig(out, format="png", dpi=120)
+    out.seek(0)
+    return out
+
+
+def build_report(summary, user_email, threshold, flagged=None):
+    # Everything comes from the run's fixed-size ScoreSummary, so the cost does not grow with the upload.
+    frauds = summary.flagged(threshold)
+    hourly = bar_chart(summary.by_hour(threshold), [str(h) for h in range(24)],
+                       "Transactions per Hour", "Hour of day")
+    bands = bar_chart(summary.by_band(threshold), summary.band_labels(),
+                      "Transactions per Amount Band", "Amount")
+
+    pdf = make_pdf()
+    pdf.add_page()
+    pdf.set_font("helvetica", size=12)
+    line(pdf, f"User: {user_email}", 10)
+    line(pdf, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 10)
+    line(pdf, f"Total Rows: {summary.rows:,}", 10)
+    line(pdf, f"Frauds Detected: {frauds:,} (threshold {threshold:.2f})", 10)
+    pdf.ln()
+    pdf.image(hourly, w=pdf.epw)
+    pdf.image(bands, w=pdf.epw)
+
+    top = summary.top[summary.top["Fraud_Prob"] >= threshold].head(REPORT_ROWS)
+    reasons = {} if flagged is None or flagged.empty else flagged["Top_Features"].to_dict()
+    pdf.add_page()
+    pdf.set_font("helvetica", "B", 12)
+    line(pdf, "Top Flagged Transactions", 10)
+    pdf.set_font("helvetica", size=10)
+    if top.empty:
+        line(pdf, "No transactions above the threshold.")
+    for row, seconds, amount, proba in top[["Row", "Time", "Amount", "Fraud_Prob"]].itertuples(index=False):
+        line(pdf, f"Row {row:,} - Time: {seconds:.0f}, Amount: {amount:.2f}, Fraud_Prob: {proba:.4f}")
+        if row in reasons:
+            line(pdf, f"    Top features: {reasons[row]}")
+    return bytes(pdf.output())
+
+
+# --- Report Engine ---
+# Reports render on a shared thread pool as soon as a result page loads; the download
+# button only waits on the future. Futures are memoized so reruns reuse them.
+class ReportEngine:
+    def __init__(self, max_workers=REPORT_WORKERS, memo=REPORT_MEMO):
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="report")
+        self.futures = OrderedDict()
+        self.memo = memo
+        self.lock = threading.Lock()
+
+    def _build(self, summary, user_email, threshold, flagged, request_id):
+        start = time.perf_counter()
+        pdf = build_report(summary, user_email, threshold, flagged)
+        log_event({"request_id": request_id, "page": "report", "stage": "pdf", "seconds": round(time.perf_counter() - start, 6),
+                   "rows": summary.rows, "bytes": len(pdf), "calls": 1})
+        return pdf
+
+    def submit(self, key, summary, user_email, threshold, flagged=None, request_id=None):
+        key = (key, user_email, round(float(threshold), 4))
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None or (future.done() and future.exception() is not None):
+                future = self.pool.submit(self._build, summary, user_email, threshold, flagged, request_id)
+                self.futures[key] = future
+            self.futures.move_to_end(key)
+            while len(self.futures) > self.memo:
+                self.futures.popitem(last=False)
+        return future
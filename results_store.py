@@ -0,0 +1,166 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- Results Store ---
+# One directory per user under the store root:
+#   <root>/<user_key>/index.json      run metadata (id, created, rows, frauds, threshold, model)
+#   <root>/<user_key>/<run_id>.parquet scored rows, zstd-compressed, one row group per chunk
+#   <root>/<user_key>/<run_id>.*.npy  score arrays of a run too large for the app's cache
+# Older versions wrote one CSV per run as <root>/<email>_<YYYY-mm-dd_HH-MM-SS>.csv.
+# Listing, previewing and deleting a user's runs only touches that user's directory.
+RESULTS_ROOT = "history"
+INDEX_FILE = "index.json"
+# Rows in a CSV download from the app. Streamlit holds a download in memory until it is
+# sent, so larger runs are cut here; score.py writes full results of any size to disk.
+EXPORT_ROWS = 500_000
+
+
+def user_key(email):
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:24]
+
+
+def csv_export(frames, max_rows=EXPORT_ROWS):
+    # Writes frames as one CSV, chunk by chunk, to a temporary file (deleted once closed);
+    # returns it rewound, so no more than one chunk is ever held as text. Unbuffered, as
+    # st.download_button reads raw files but not buffered random-access ones.
+    out = tempfile.TemporaryFile(buffering=0)
+    rows = 0
+    for frame in frames:
+        frame = frame.iloc[:max_rows - rows]
+        out.write(frame.to_csv(header=rows == 0, index=False).encode())
+        rows += len(frame)
+        if rows >= max_rows:
+            break
+    out.seek(0)
+    return out
+
+
+class RunWriter:
+    def __init__(self, store, email, run_id, path, meta):
+        self.store = store
+        self.email = email
+        self.run_id = run_id
+        self.path = path
+        self.meta = meta
+        self.writer = None
+        self.rows = 0
+        self.frauds = 0
+
+    def write(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self.writer.write_table(table)
+        self.rows += len(df)
+        self.frauds += int(df["Prediction"].sum())
+
+    def close(self):
+        if self.writer is None:
+            return None
+        self.writer.close()
+        return self.store._add_run(self.email, {
+            "run_id": self.run_id,
+            "file": os.path.basename(self.path),
+            "rows": self.rows,
+            "frauds": self.frauds,
+            "bytes": os.path.getsize(self.path),
+            **self.meta,
+        })
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ResultsStore:
+    def __init__(self, root=RESULTS_ROOT):
+        self.root = root
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def user_dir(self, email):
+        return os.path.join(self.root, user_key(email))
+
+    def run_path(self, email, run_id):
+        return os.path.join(self.user_dir(email), f"{run_id}.parquet")
+
+    # --- Index ---
+    def _read_index(self, email):
+        path = os.path.join(self.user_dir(email), INDEX_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_index(self, email, runs):
+        path = os.path.join(self.user_dir(email), INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(runs, f)
+        os.replace(tmp, path)
+
+    def _add_run(self, email, entry):
+        with self.lock:
+            runs = self._read_index(email)
+            runs.append(entry)
+            self._write_index(email, runs)
+        return entry
+
+    # --- Runs ---
+    def start_run(self, email, **meta):
+        os.makedirs(self.user_dir(email), exist_ok=True)
+        created = datetime.now()
+        run_id = created.strftime("%Y-%m-%d_%H-%M-%S-%f")
+        meta = {"created": created.isoformat(timespec="seconds"), **meta}
+        return RunWriter(self, email, run_id, self.run_path(email, run_id), meta)
+
+    def list_runs(self, email):
+        return sorted(self._read_index(email), key=lambda r: r["run_id"], reverse=True)
+
+    def get_run(self, email, run_id):
+        return next((r for r in self._read_index(email) if r["run_id"] == run_id), None)
+
+    def preview(self, email, run_id, n=20, columns=None):
+        parquet = pq.ParquetFile(self.run_path(email, run_id))
+        batch = next(parquet.iter_batches(batch_size=n, columns=columns), None)
+        if batch is None:
+            return parquet.schema_arrow.empty_table().to_pandas()
+        return batch.to_pandas()
+
+    def iter_batches(self, email, run_id, columns=None, batch_size=100_000):
+        parquet = pq.ParquetFile(self.run_path(email, run_id))
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+    def to_csv(self, email, run_id, max_rows=EXPORT_ROWS):
+        return csv_export(self.iter_batches(email, run_id), max_rows)
+
+    def delete_run(self, email, run_id):
+        with self.lock:
+            runs = self._read_index(email)
+            self._write_index(email, [r for r in runs if r["run_id"] != run_id])
+        # The results file, and any score arrays spilled beside it (score_cache.ScoredRun.spill).
+        for path in glob.glob(os.path.join(self.user_dir(email), f"{run_id}.*")):
+            os.remove(path)
+
+    def _legacy_files(self, email):
+        pattern = re.compile(re.escape(email.strip()) + r"_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}\.csv", re.IGNORECASE)
+        return [os.path.join(self.root, name) for name in os.listdir(self.root) if pattern.fullmatch(name)]
+
+    def delete_user(self, email):
+        with self.lock:
+            shutil.rmtree(self.user_dir(email), ignore_errors=True)
+            for path in self._legacy_files(email):
+                os.remove(path)
@@ -0,0 +1,141 @@
+import argparse
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from engines import single_threaded
+from ingest import Quarantine, stem
+from scoring import CHUNK_SIZE, MODEL_PATH, SCALER_PATH, iter_scored_chunks, load_artifacts
+
+# --- Worker State ---
+# Each worker process loads the model once and reuses it for every file it scores.
+_model = None
+_scaler = None
+
+
+def _init_worker(model_path, scaler_path):
+    global _model, _scaler
+    _model, _scaler = load_artifacts(model_path, scaler_path)
+    # Parallelism comes from the process pool; keep each model single-threaded.
+    single_threaded(_model)
+
+
+def output_names(paths):
+    # path -> output name. Inputs sharing a stem (in/a/day.csv, in/b/day.csv) get a short
+    # hash of their full path appended, so no two inputs write to the same files.
+    stems = [stem(p) for p in paths]
+    return {p: s if stems.count(s) == 1 else
+            f"{s}-{hashlib.blake2b(os.path.abspath(p).encode(), digest_size=4).hexdigest()}"
+            for p, s in zip(paths, stems)}
+
+
+# --- Output Writers ---
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {"parquet": ParquetWriter, "csv": CsvWriter}
+
+
+def score_file(path, out_dir, fmt="parquet", threshold=0.5, chunksize=CHUNK_SIZE, name=None):
+    name = name or stem(path)
+    out_path = os.path.join(out_dir, f"{name}_scored.{fmt}")
+    start = time.perf_counter()
+    rows = frauds = 0
+    quarantine = Quarantine()
+    writer = WRITERS[fmt](out_path)
+    try:
+        for scored, _ in iter_scored_chunks(path, _model, _scaler, threshold, chunksize, quarantine):
+            writer.write(scored)
+            rows += len(scored)
+            frauds += int(scored["Prediction"].sum())
+    finally:
+        writer.close()
+    if quarantine.rows:
+        quarantine.to_frame().to_csv(os.path.join(out_dir, f"{name}_quarantine.csv"), index=False)
+    return path, out_path, rows, frauds, quarantine.rows, time.perf_counter() - start
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        paths.extend(p for p in matches if p not in paths)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score transaction CSVs with the trained fraud model.")
+    parser.add_argument("inputs", nargs="+", help="CSV (optionally .gz/.zst) or Parquet paths, or glob patterns")
+    parser.add_argument("-o", "--out-dir", required=True, help="directory for scored output files")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="parquet")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    args = parser.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        parser.error(f"input not found: {', '.join(missing)}")
+    os.makedirs(args.out_dir, exist_ok=True)
+    names = output_names(paths)
+
+    print(f"📥 Scoring {len(paths)} file(s) with {args.workers} worker(s)...")
+    start = time.perf_counter()
+    total_rows = total_frauds = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(args.model, args.scaler)
+    ) as pool:
+        futures = [
+            pool.submit(score_file, p, args.out_dir, args.format, args.threshold, args.chunksize, names[p])
+            for p in paths
+        ]
+        for future in as_completed(futures):
+            path, out_path, rows, frauds, bad_rows, seconds = future.result()
+            total_rows += rows
+            total_frauds += frauds
+            print(f"  {path} -> {out_path}: {rows:,} rows, {frauds:,} frauds, "
+                  f"{rows / max(seconds, 1e-9):,.0f} rows/sec")
+            if bad_rows:
+                print(f"  ⚠️ {bad_rows:,} unreadable row(s) skipped; see {names[path]}_quarantine.csv")
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {total_rows:,} rows, {total_frauds:,} frauds in {elapsed:.1f}s "
+          f"({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from ingest import Quarantine
+from results_store import EXPORT_ROWS, csv_export
+from scoring import CHUNK_SIZE
+from threshold import ThresholdCurve
+
+# Default memory budget shared by all sessions of one server process.
+CACHE_BYTES = 512 * 2**20
+# Chart payloads memoized per run (one per threshold); each is a few hundred KB at most.
+CHART_MEMO = 8
+
+
+def content_hash(fileobj, block_size=2**20):
+    digest = hashlib.blake2b(digest_size=16)
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def resident_bytes(array):
+    # Bytes an array holds in memory; one mapped from disk holds none of its own.
+    return 0 if array is None or isinstance(array, np.memmap) else int(array.nbytes)
+
+
+def spill_array(array, path):
+    np.save(path, array)
+    return np.load(path, mmap_mode="r")
+
+
+# --- Scored Run ---
+# Everything needed to re-derive predictions for a new threshold without rescoring:
+# the exact probability of every row, the in-memory preview, the stored results file, and
+# the sorted threshold curve (with ground truth when the upload had a Class column), the
+# rows that could not be scored, and the whole-run chart summaries (chart_data.ChartSketch).
+class ScoredRun:
+    def __init__(self, proba, view, summary, results_file, labels=None, quarantine=None, sketch=None):
+        self.proba = proba
+        self.view = view
+        self.summary = summary
+        self.results_file = results_file
+        self.curve = ThresholdCurve(proba, labels)
+        self.quarantine = quarantine or Quarantine()
+        self.sketch = sketch
+        self.charts = {}
+
+    @property
+    def rows(self):
+        return len(self.proba)
+
+    @property
+    def spilled(self):
+        return isinstance(self.proba, np.memmap)
+
+    @property
+    def nbytes(self):
+        # Memoized chart payloads count too; put the run again after adding one to update the cache's total.
+        return int(resident_bytes(self.proba) + self.view.memory_usage(deep=True).sum() + self.curve.nbytes
+                   + self.quarantine.nbytes + self.sketch.nbytes + sum(c.nbytes for c in self.charts.values()))
+
+    def spill(self):
+        # Moves the per-row arrays (probabilities and the threshold curve's sorted scores and
+        # counts) to .npy files beside the results file and maps them back read-only. They are
+        # then paged in from disk on use, and only the fixed-size parts count as memory.
+        base = os.path.splitext(self.results_file)[0]
+        self.proba = spill_array(self.proba, base + ".proba.npy")
+        for name in ("sorted", "positives", "unknown"):
+            array = getattr(self.curve, name)
+            if array is not None:
+                setattr(self.curve, name, spill_array(array, f"{base}.{name}.npy"))
+
+    def frauds(self, threshold):
+        return self.curve.flagged(threshold)
+
+    def view_at(self, threshold):
+        df = self.view.copy()
+        df["Prediction"] = (self.proba[:len(df)] >= threshold).astype(np.int8)
+        return df
+
+    def chart_data(self, threshold):
+        key = round(float(threshold), 4)
+        if key not in self.charts:
+            if len(self.charts) >= CHART_MEMO:
+                self.charts.pop(next(iter(self.charts)))
+            self.charts[key] = self.sketch.chart_data(threshold, self.summary.by_hour(threshold))
+        return self.charts[key]
+
+    def to_csv(self, threshold, max_rows=EXPORT_ROWS, chunksize=CHUNK_SIZE):
+        # The stored rows re-labelled at threshold, as a temporary CSV file (results_store.csv_export).
+        def chunks():
+            offset = 0
+            for batch in pq.ParquetFile(self.results_file).iter_batches(batch_size=chunksize):
+                chunk = batch.to_pandas()
+                chunk["Prediction"] = (self.proba[offset:offset + len(chunk)] >= threshold).astype(np.int8)
+                offset += len(chunk)
+                yield chunk
+        return csv_export(chunks(), max_rows)
+
+
+# --- LRU Cache with a Byte Budget ---
+class ScoreCache:
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, run):
+        # False if the run alone exceeds the budget; the caller can spill it (ScoredRun.spill) and retry.
+        # Sizes are stored with the entries, so a run that grew since it was put is released correctly.
+        size = run.nbytes
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return False
+            while self.entries and self.bytes + size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+            self.entries[key] = (run, size)
+            self.bytes += size
+        return True
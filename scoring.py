@@ -0,0 +1,140 @@
+import joblib
+import numpy as np
+import pandas as pd
+
+from instrument import stage
+
+# --- Artifacts ---
+MODEL_PATH = "model/fraud_model.pkl"
+SCALER_PATH = "model/scaler.pkl"
+
+# --- Schema ---
+FEATURES = ['Time'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
+DTYPES = {col: np.float32 for col in FEATURES}
+# Ground-truth column; passed through with the scores when an upload carries it.
+LABEL = "Class"
+
+# Rows per chunk when streaming an upload; peak memory scales with this, not the file size.
+CHUNK_SIZE = 100_000
+# Probability histogram resolution for the running totals.
+PROBA_BINS = 1000
+
+
+def load_artifacts(model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    return joblib.load(model_path), joblib.load(scaler_path)
+
+
+def missing_columns(columns):
+    return [col for col in FEATURES if col not in columns]
+
+
+def artifact_version(model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    from score_cache import content_hash
+
+    digests = []
+    for path in (model_path, scaler_path):
+        with open(path, "rb") as f:
+            digests.append(content_hash(f))
+    return "-".join(d[:8] for d in digests)
+
+
+def score_frame(df, model, scaler, threshold, timer=None, scorer=None):
+    # scorer (a parallel_scoring.ParallelScorer) splits large frames across worker processes.
+    if scorer is not None:
+        with stage(timer, "predict", len(df)):
+            proba = scorer.predict_proba(df, model, scaler)
+    else:
+        with stage(timer, "scale", len(df)):
+            X_scaled = scaler.transform(df[FEATURES])
+        with stage(timer, "predict", len(df)):
+            proba = model.predict_proba(X_scaled)[:, 1]
+    prediction = (proba >= threshold).astype(np.int8)
+
+    columns = FEATURES + [LABEL] if LABEL in df else FEATURES
+    if list(df.columns) != columns:
+        df = df[columns]
+    df = df.assign(Prediction=prediction, Fraud_Prob=proba.round(4))
+    return df, proba
+
+
+# Yields (scored frame, exact probabilities) per chunk; Fraud_Prob in the frame is rounded.
+# Rows that fail coercion are skipped and recorded in the optional ingest.Quarantine.
+def iter_scored_chunks(source, model, scaler, threshold, chunksize=CHUNK_SIZE, quarantine=None, timer=None,
+                       scorer=None):
+    from ingest import iter_chunks
+
+    chunks = iter_chunks(source, chunksize, quarantine)
+    while True:
+        with stage(timer, "parse") as record:
+            chunk = next(chunks, None)
+            record["rows"] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield score_frame(chunk, model, scaler, threshold, timer, scorer)
+
+
+# --- Running Totals ---
+# Fixed-size aggregates kept while a run is scored. Every count is binned by exact
+# probability, so totals for any threshold are a slice sum and never touch the rows.
+# Upper edges of the Amount bands used by the report.
+AMOUNT_BANDS = [10, 50, 100, 500, 1000, 5000]
+# Highest-probability rows kept for the report.
+TOP_ROWS = 20
+
+
+class ScoreSummary:
+    def __init__(self, top_rows=TOP_ROWS):
+        self.rows = 0
+        self.frauds = 0
+        self.proba_hist = np.zeros(PROBA_BINS + 1, dtype=np.int64)
+        self.hour_hist = np.zeros((24, PROBA_BINS + 1), dtype=np.int64)
+        self.band_hist = np.zeros((len(AMOUNT_BANDS) + 1, PROBA_BINS + 1), dtype=np.int64)
+        self.top_rows = top_rows
+        self.top = pd.DataFrame({
+            "Row": np.array([], dtype=np.int64), "Time": np.array([], dtype=np.float32),
+            "Amount": np.array([], dtype=np.float32), "Fraud_Prob": np.array([], dtype=np.float64),
+        })
+
+    def update(self, scored, proba):
+        bins = np.minimum((proba * PROBA_BINS).astype(np.int64), PROBA_BINS)
+        hour = ((scored["Time"].to_numpy() // 3600) % 24).astype(np.int64)
+        band = np.searchsorted(AMOUNT_BANDS, scored["Amount"].to_numpy(), side="right")
+        width = PROBA_BINS + 1
+        self.proba_hist += np.bincount(bins, minlength=width)
+        self.hour_hist += np.bincount(hour * width + bins, minlength=self.hour_hist.size).reshape(self.hour_hist.shape)
+        self.band_hist += np.bincount(band * width + bins, minlength=self.band_hist.size).reshape(self.band_hist.shape)
+
+        # Partial sort: only the chunk's top candidates are merged into the running top rows.
+        k = min(self.top_rows, len(proba))
+        if k:
+            idx = np.argpartition(-proba, k - 1)[:k]
+            chunk_top = pd.DataFrame({
+                "Row": self.rows + idx, "Time": scored["Time"].to_numpy()[idx],
+                "Amount": scored["Amount"].to_numpy()[idx], "Fraud_Prob": proba[idx],
+            })
+            merged = pd.concat([self.top, chunk_top], ignore_index=True)
+            self.top = merged.nlargest(self.top_rows, "Fraud_Prob", keep="first").reset_index(drop=True)
+        self.rows += len(scored)
+        self.frauds += int(scored["Prediction"].sum())
+
+    def threshold_bin(self, threshold):
+        return int(np.ceil(round(threshold * PROBA_BINS, 6)))
+
+    def flagged(self, threshold):
+        return int(self.proba_hist[self.threshold_bin(threshold):].sum())
+
+    def by_hour(self, threshold):
+        # (24, 2) legit/fraud counts per hour of day.
+        cut = self.threshold_bin(threshold)
+        fraud = self.hour_hist[:, cut:].sum(axis=1)
+        return np.column_stack([self.hour_hist.sum(axis=1) - fraud, fraud])
+
+    def by_band(self, threshold):
+        # (bands, 2) legit/fraud counts per Amount band.
+        cut = self.threshold_bin(threshold)
+        fraud = self.band_hist[:, cut:].sum(axis=1)
+        return np.column_stack([self.band_hist.sum(axis=1) - fraud, fraud])
+
+    def band_labels(self):
+        edges = [0] + AMOUNT_BANDS
+        return [f"{lo:,}-{hi:,}" for lo, hi in zip(edges, edges[1:])] + [f"{edges[-1]:,}+"]
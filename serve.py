@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import math
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aiohttp import web
+
+from drift import DRIFT_PATH, DriftMonitor, DriftSketch
+from engines import engine_of, single_threaded
+from model_bundle import load_bundle
+from registry import LiveModel, ShadowMonitor
+from scoring import FEATURES, MODEL_PATH, SCALER_PATH, load_artifacts, missing_columns
+
+
+# --- Latency / Batch Metrics ---
+class Metrics:
+    def __init__(self, window=10_000):
+        self.latencies_ms = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+
+    def record_batch(self, size):
+        self.batches += 1
+        # Power-of-two buckets: 1, 2, 4, 8, ...
+        self.batch_sizes[1 << (size - 1).bit_length()] += 1
+
+    def record_latency(self, ms, failed=False):
+        # Every request counts, including the ones answered with an error.
+        self.requests += 1
+        self.errors += failed
+        self.latencies_ms.append(ms)
+
+    def snapshot(self):
+        lat = np.fromiter(self.latencies_ms, dtype=np.float64)
+        percentiles = np.percentile(lat, [50, 90, 99]) if lat.size else [0.0, 0.0, 0.0]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "latency_ms": {"p50": round(percentiles[0], 3), "p90": round(percentiles[1], 3),
+                           "p99": round(percentiles[2], 3), "window": int(lat.size)},
+            "batch_size_histogram": {f"<={k}": v for k, v in sorted(self.batch_sizes.items())},
+        }
+
+
+# --- Predictors ---
+# A predictor maps a raw (n, 30) feature matrix to fraud probabilities.
+def sklearn_predictor(model, scaler):
+    # Batches are small; joblib's thread fan-out costs more than it saves here.
+    single_threaded(model)
+    mean = scaler.mean_.astype(np.float64)
+    scale = scaler.scale_.astype(np.float64)
+
+    def predict(X):
+        return model.predict_proba((X - mean) / scale)[:, 1]
+    return predict
+
+
+def bundle_predictor(bundle):
+    def predict(X):
+        return bundle.predict_proba(X)[:, 1]
+    return predict
+
+
+def registry_predictor(live, shadow=None, threshold=0.5):
+    # Follows the registry's active version; each batch is scored by the version current when it starts.
+    predictors = {}
+
+    def predict(X):
+        deployment = live.current()
+        fn = predictors.get(deployment.version)
+        if fn is None:
+            predictors.clear()
+            fn = predictors[deployment.version] = sklearn_predictor(deployment.model, deployment.scaler)
+        start = time.perf_counter()
+        proba = fn(X)
+        candidate = live.candidate() if shadow is not None else None
+        if candidate is not None:
+            shadow.observe(deployment.version, candidate, X, proba, (time.perf_counter() - start) * 1000, threshold)
+        return proba
+    return predict
+
+
+# --- Micro-Batching Scorer ---
+class MicroBatcher:
+    def __init__(self, predict, threshold=0.5, max_batch=256, max_wait_ms=2.0, sketch=None):
+        self.predict = predict
+        self.threshold = threshold
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = Metrics()
+        # Drift sketch of the traffic served since startup; only the scoring thread updates it.
+        self.sketch = sketch
+        self.queue = asyncio.Queue()
+        # Scoring runs off the event loop so new requests keep queueing while a batch is scored.
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def score(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    def _predict(self, X):
+        proba = self.predict(X)
+        if self.sketch is not None:
+            self.sketch.update(X, proba)
+        return proba
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            X = np.array([row for row, _ in batch], dtype=np.float64)
+            self.metrics.record_batch(len(batch))
+            try:
+                proba = await loop.run_in_executor(self.executor, self._predict, X)
+            except Exception:
+                # Score the rows one by one, so a single bad row fails only its own request.
+                for i, (_, future) in enumerate(batch):
+                    try:
+                        p = (await loop.run_in_executor(self.executor, self._predict, X[i:i + 1]))[0]
+                    except Exception as exc:
+                        if not future.done():
+                            future.set_exception(exc)
+                    else:
+                        if not future.done():
+                            future.set_result(float(p))
+                continue
+            for (_, future), p in zip(batch, proba):
+                if not future.done():
+                    future.set_result(float(p))
+
+
+# --- HTTP Handlers ---
+def parse_transaction(payload):
+    if not isinstance(payload, dict):
+        raise web.HTTPBadRequest(reason="Expected a JSON object per transaction.")
+    missing = missing_columns(payload)
+    if missing:
+        raise web.HTTPBadRequest(reason=f"Missing required columns: {', '.join(missing)}")
+    try:
+        row = [float(payload[col]) for col in FEATURES]
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(reason="Feature values must be numeric.")
+    # json.loads accepts NaN and Infinity, which the model cannot score.
+    if not all(math.isfinite(v) for v in row):
+        raise web.HTTPBadRequest(reason="Feature values must be finite.")
+    return row
+
+
+async def handle_score(request):
+    start = time.perf_counter()
+    batcher = request.app["batcher"]
+    failed = True
+    try:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(reason="Body must be JSON.")
+
+        single = not isinstance(payload, list)
+        rows = [parse_transaction(p) for p in ([payload] if single else payload)]
+        probas = await asyncio.gather(*(batcher.score(row) for row in rows))
+        results = [
+            {"Prediction": int(p >= batcher.threshold), "Fraud_Prob": round(p, 4)}
+            for p in probas
+        ]
+        failed = False
+    finally:
+        batcher.metrics.record_latency((time.perf_counter() - start) * 1000, failed)
+    return web.json_response(results[0] if single else results)
+
+
+async def handle_metrics(request):
+    snapshot = request.app["batcher"].metrics.snapshot()
+    if request.app["live"] is not None:
+        deployment = request.app["live"].current()
+        snapshot["model_version"] = deployment.version
+        snapshot["model_engine"] = engine_of(deployment.model)
+    return web.json_response(snapshot)
+
+
+async def handle_shadow(request):
+    # Disagreement and latency of the registry's candidate against the active model.
+    shadow = request.app["shadow"]
+    return web.json_response(shadow.snapshot() if shadow is not None else [])
+
+
+async def handle_drift(request):
+    # Live traffic since startup plus the per-run history recorded by the app, newest last.
+    monitor = request.app["drift"]
+    batcher = request.app["batcher"]
+    try:
+        limit = int(request.query.get("runs", 100))
+    except ValueError:
+        raise web.HTTPBadRequest(reason="runs must be an integer.")
+    runs = monitor.history()[-limit:] if limit > 0 else []
+    runs = [{k: v for k, v in r.items() if k != "score_counts"} for r in runs]
+    live = monitor.report(batcher.sketch) if batcher.sketch is not None and batcher.sketch.rows else None
+    return web.json_response({"live": live, "runs": runs})
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+def create_app(predict, threshold=0.5, max_batch=256, max_wait_ms=2.0, scaler_stats=None, drift_path=DRIFT_PATH,
+               live=None, shadow=None):
+    app = web.Application()
+    app["drift"] = DriftMonitor(drift_path)
+    app["live"] = live
+    app["shadow"] = shadow
+
+    async def on_startup(app):
+        sketch = DriftSketch(*scaler_stats) if scaler_stats is not None else None
+        app["batcher"] = MicroBatcher(predict, threshold, max_batch, max_wait_ms, sketch)
+        app["batcher"].start()
+
+    async def on_cleanup(app):
+        await app["batcher"].stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/score", handle_score)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/drift", handle_drift)
+    app.router.add_get("/shadow", handle_shadow)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the fraud model over HTTP with micro-batching.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="how long the first request in a batch waits for company")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--bundle", help="memory-mapped model bundle to serve instead of the pickles")
+    parser.add_argument("--registry", action="store_true",
+                        help="serve the registry's active version, hot-swapping on promotion and shadowing the candidate")
+    parser.add_argument("--drift-log", default=DRIFT_PATH, help="per-run drift history written by the app")
+    args = parser.parse_args(argv)
+
+    live = shadow = None
+    if args.registry:
+        live, shadow = LiveModel(), ShadowMonitor()
+        predict = registry_predictor(live, shadow, args.threshold)
+        scaler = live.current().scaler
+        scaler_stats = (scaler.mean_, scaler.scale_)
+    elif args.bundle:
+        bundle = load_bundle(args.bundle)
+        predict = bundle_predictor(bundle)
+        scaler_stats = (bundle.scaler_mean, bundle.scaler_scale)
+    else:
+        model, scaler = load_artifacts(args.model, args.scaler)
+        predict = sklearn_predictor(model, scaler)
+        scaler_stats = (scaler.mean_, scaler.scale_)
+    app = create_app(predict, args.threshold, args.max_batch, args.max_wait_ms, scaler_stats, args.drift_log,
+                     live, shadow)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
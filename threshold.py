@@ -0,0 +1,109 @@
+import numpy as np
+
+# Thresholds sampled for the precision/recall/alerts curve drawn in the app.
+CURVE_POINTS = 201
+# Default cost of a missed fraud relative to a false alarm.
+COST_RATIO = 10.0
+
+
+# --- Threshold Curve ---
+# Fraud_Prob is sorted once per run, with a suffix count of true frauds next to it.
+# Flagged rows, true positives and everything derived from them are then a binary
+# search away for any threshold: flagged(t) = n - searchsorted(sorted, t).
+# Labels are 1 (fraud) or 0 (legit); anything else (e.g. -1) is unknown, and those rows
+# count as alerts but never as true or false positives.
+class ThresholdCurve:
+    def __init__(self, proba, labels=None):
+        self.sorted = np.sort(np.asarray(proba, dtype=np.float32))
+        self.positives = None
+        self.unknown = None
+        if labels is not None:
+            labels = np.asarray(labels)[np.argsort(proba, kind="stable")]
+            # positives[i] = true frauds among sorted[i:]
+            self.positives = self._suffix_count(labels == 1)
+            unknown = (labels != 0) & (labels != 1)
+            if unknown.any():
+                # unknown[i] = unlabeled rows among sorted[i:]
+                self.unknown = self._suffix_count(unknown)
+        self.grid = None
+
+    @staticmethod
+    def _suffix_count(mask):
+        counts = np.zeros(len(mask) + 1, dtype=np.int64)
+        counts[:-1] = np.cumsum(mask[::-1])[::-1]
+        return counts
+
+    def _labeled_at(self, idx):
+        # Rows with a known label among sorted[idx:].
+        return self.rows - idx - (0 if self.unknown is None else self.unknown[idx])
+
+    @property
+    def rows(self):
+        return len(self.sorted)
+
+    @property
+    def labeled(self):
+        return self.positives is not None and (self.unknown is None or self.unknown[0] < self.rows)
+
+    @property
+    def nbytes(self):
+        # Arrays mapped from disk (score_cache.ScoredRun.spill) hold no memory of their own.
+        return int(sum(a.nbytes for a in (self.sorted, self.positives, self.unknown)
+                       if a is not None and not isinstance(a, np.memmap)))
+
+    def _index(self, threshold):
+        return np.searchsorted(self.sorted, np.float32(threshold), side="left")
+
+    def flagged(self, threshold):
+        return int(self.rows - self._index(threshold))
+
+    def metrics(self, threshold, cost_ratio=COST_RATIO):
+        # Works on scalars or arrays of thresholds.
+        idx = self._index(threshold)
+        flagged = self.rows - idx
+        out = {"threshold": threshold, "flagged": flagged, "alert_rate": flagged / max(self.rows, 1)}
+        if self.labeled:
+            total = self.positives[0]
+            tp = self.positives[idx]
+            known = self._labeled_at(idx)
+            fp = known - tp
+            fn = total - tp
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out["precision"] = np.where(known > 0, tp / np.maximum(known, 1), 1.0)
+                out["recall"] = np.where(total > 0, tp / max(total, 1), 0.0)
+            out.update(tp=tp, fp=fp, fn=fn, cost=fp + cost_ratio * fn)
+        return out
+
+    def curve(self):
+        # Metrics on a fixed threshold grid; computed once, then reused on every slider move.
+        if self.grid is None:
+            thresholds = np.linspace(0.0, 1.0, CURVE_POINTS)
+            self.grid = self.metrics(thresholds)
+        return self.grid
+
+    # --- Recommendations ---
+    def for_alert_budget(self, max_alerts):
+        # Lowest threshold that raises at most max_alerts alerts.
+        if max_alerts >= self.rows:
+            return float(self.sorted[0]) if self.rows else 0.0
+        if max_alerts <= 0:
+            return float(np.nextafter(self.sorted[-1], np.float32(np.inf)))
+        threshold = self.sorted[self.rows - max_alerts]
+        if self.flagged(threshold) > max_alerts:
+            threshold = np.nextafter(threshold, np.float32(np.inf))
+        return float(threshold)
+
+    def for_cost_ratio(self, cost_ratio=COST_RATIO):
+        # Threshold minimising false alarms + cost_ratio x missed frauds; needs labels.
+        if not self.labeled or not self.rows:
+            return None
+        # Only distinct scores are meaningful cut points: cutting at sorted[i] flags rows i..n.
+        starts = np.flatnonzero(np.r_[True, self.sorted[1:] != self.sorted[:-1]])
+        tp = self.positives[starts]
+        cost = (self._labeled_at(starts) - tp) + cost_ratio * (self.positives[0] - tp)
+        # Flagging nothing is also a candidate.
+        none_cost = cost_ratio * self.positives[0]
+        best = int(np.argmin(cost))
+        if none_cost < cost[best]:
+            return float(np.nextafter(self.sorted[-1], np.float32(np.inf)))
+        return float(self.sorted[starts[best]])
@@ -1,37 +1,418 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, confusion_matrix
-from imblearn.over_sampling import SMOTE
 import joblib
-import os
 
-print("📥 Loading dataset...")
-df = pd.read_csv("data/creditcard.csv")
+from drift import DriftSketch, save_baseline
+from engines import DEFAULT_ENGINE, ENGINES, FOREST_ENGINES, engine_of, make_model
+from scoring import DTYPES, FEATURES, MODEL_PATH, SCALER_PATH
+
+DATA_PATH = "data/creditcard.csv"
+# float32 features + label, used to turn a memory budget into shard sizes.
+BYTES_PER_ROW = len(FEATURES) * 4 + 1
+# Rough peak-to-data ratio of fitting a forest on one shard (bootstrap indices, sorting, tree buffers).
+FIT_OVERHEAD = 6
+
+# --- Search Space ---
+# name -> (module, class, fixed parameters), as in model_compare.CANDIDATES.
+TUNE_MODELS = {
+    "rf": ("sklearn.ensemble", "RandomForestClassifier", {"n_jobs": 1}),
+    "gb": ("sklearn.ensemble", "GradientBoostingClassifier", {}),
+    "hgb": ENGINES["hgb"],
+}
+SEARCH_SPACES = [
+    {"model": ["rf"], "n_estimators": [100, 200, 400], "max_depth": [8, 12, 16, None],
+     "min_samples_leaf": [1, 2, 5], "max_features": ["sqrt", 0.5], "class_weight": [None, "balanced_subsample"]},
+    {"model": ["gb"], "n_estimators": [100, 200, 400], "learning_rate": [0.03, 0.1, 0.3],
+     "max_depth": [2, 3, 4], "subsample": [0.5, 0.8, 1.0]},
+    {"model": ["hgb"], "max_iter": [100, 200, 400], "learning_rate": [0.03, 0.1, 0.3],
+     "max_leaf_nodes": [15, 31, 63], "min_samples_leaf": [20, 50, 100], "l2_regularization": [0.0, 1.0]},
+]
+TUNE_RESULTS = "model/tuning_results.csv"
+RESULT_COLUMNS = ["search_id", "candidate", "round", "n_resources", "fold", "model", "params",
+                  "average_precision", "fit_seconds"]
+# Fraud rows each cross-validation fold should get in the first, smallest round.
+MIN_FOLD_FRAUD = 20
+
+
+def save_artifacts(model, scaler, baseline):
+    os.makedirs("model", exist_ok=True)
+    joblib.dump(model, MODEL_PATH)
+    joblib.dump(scaler, SCALER_PATH)
+    # Training feature histograms that drift monitoring compares scored runs against.
+    save_baseline(baseline)
+    print(f"✅ Model ({engine_of(model)}) and Scaler saved.")
+
+
+def report(y_test, y_pred):
+    print("\n📊 Classification Report:\n", classification_report(y_test, y_pred))
+    print("\n🟦 Confusion Matrix:\n", confusion_matrix(y_test, y_pred))
+
+
+def engine_params(args):
+    # --n-estimators is the tree count of a forest and the boosting rounds of hgb.
+    if args.engine == "hgb":
+        return {"max_iter": args.n_estimators, "max_depth": args.max_depth, "learning_rate": args.learning_rate}
+    return {"n_estimators": args.n_estimators, "max_depth": args.max_depth}
+
+
+# --- In-Memory Training ---
+def load_split(args):
+    # Hold out the evaluation split before any resampling, so synthetic rows never reach it;
+    # the scaler and drift baseline only see the training side.
+    print("📥 Loading dataset...")
+    df = pd.read_csv(args.data, usecols=FEATURES + ["Class"], dtype={**DTYPES, "Class": np.int8})
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[FEATURES], df["Class"].to_numpy(), test_size=args.test_size, stratify=df["Class"], random_state=42)
+
+    scaler = StandardScaler().fit(X_train)
+    baseline = DriftSketch(scaler.mean_, scaler.scale_)
+    baseline.update(X_train.to_numpy())
+    return scaler.transform(X_train), scaler.transform(X_test), y_train, y_test, scaler, baseline
+
+
+def train_in_memory(args):
+    from imblearn.over_sampling import SMOTE
+
+    X_train, X_test, y_train, y_test, scaler, baseline = load_split(args)
+
+    print("⚖️ Applying SMOTE to the training split...")
+    smote = SMOTE(random_state=42)
+    X_resampled, y_resampled = smote.fit_resample(X_train, y_train)
+
+    print(f"🧠 Training {args.engine} model...")
+    start = time.perf_counter()
+    model = make_model(args.engine, engine_params(args)).fit(X_resampled, y_resampled)
+    print(f"   fitted in {time.perf_counter() - start:.1f} s")
+
+    report(y_test, model.predict(X_test))
+    save_artifacts(model, scaler, baseline)
+
+
+# --- Streaming (Out-of-Core) Training ---
+def iter_chunks(path, chunksize):
+    for chunk in pd.read_csv(path, usecols=FEATURES + ["Class"], dtype={**DTYPES, "Class": np.int8},
+                             chunksize=chunksize):
+        yield chunk[FEATURES], chunk["Class"].to_numpy()
+
+
+def fit_scaler_incrementally(path, chunksize):
+    scaler = StandardScaler()
+    counts = np.zeros(2, dtype=np.int64)
+    for X, y in iter_chunks(path, chunksize):
+        scaler.partial_fit(X)
+        counts += np.bincount(y, minlength=2)[:2]
+    return scaler, counts
+
+
+def fit_shard(shard_path, n_estimators, max_depth, seed):
+    data = np.load(shard_path)
+    X, y = data["X"], data["y"]
+    if len(np.unique(y)) < 2:
+        return None
+    model = make_model("rf", {"n_estimators": n_estimators, "max_depth": max_depth, "n_jobs": 1}, seed)
+    return model.fit(X, y)
+
+
+def fit_pooled(shard_paths, args, max_rows, seed=42):
+    # Boosting cannot be split into independent shard models: every round corrects the
+    # previous ones. The undersampled shards are small, so they are pooled and fitted as
+    # one model; hgb bins features to one byte each, so the pool costs little beyond the shards.
+    X, y = [], []
+    for path in shard_paths:
+        data = np.load(path)
+        X.append(data["X"])
+        y.append(data["y"])
+    X, y = np.concatenate(X), np.concatenate(y)
+    if len(y) > max_rows:
+        print(f"   pooled sample capped at {max_rows:,} of {len(y):,} rows by --max-memory-mb")
+        rows = np.random.default_rng(seed).permutation(len(y))[:max_rows]
+        X, y = X[rows], y[rows]
+    if len(np.unique(y)) < 2:
+        return None
+    return make_model(args.engine, engine_params(args), seed).fit(X, y)
+
+
+def merge_forests(forests):
+    merged = forests[0]
+    merged.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+    merged.n_estimators = len(merged.estimators_)
+    merged.n_jobs = -1
+    return merged
+
+
+def train_streaming(args):
+    from joblib import Parallel, delayed
+
+    rng = np.random.default_rng(42)
+    n_jobs = args.n_jobs if args.n_jobs > 0 else os.cpu_count()
+    shard_rows = max(args.max_memory_mb * 2**20 // (BYTES_PER_ROW * FIT_OVERHEAD * n_jobs), 1000)
+
+    print("📥 Pass 1: fitting scaler incrementally...")
+    scaler, counts = fit_scaler_incrementally(args.data, args.chunksize)
+    legit, fraud = int(counts[0]), int(counts[1])
+    if not fraud:
+        raise SystemExit("❌ No fraud rows in the training data.")
+    # Keep every fraud row and an equal-rate sample of legit rows across all chunks.
+    keep_legit = min(1.0, args.neg_ratio * fraud / max(legit, 1))
+    # The evaluation split is capped too, so it cannot outgrow the memory budget.
+    test_rate = min(args.test_size, args.max_eval_rows / (legit + fraud))
+    print(f"   {legit + fraud:,} rows ({fraud:,} fraud); keeping {keep_legit:.2%} of legit rows")
+
+    print(f"⚖️ Pass 2: undersampling into shards of ≤{shard_rows:,} rows...")
+    workdir = tempfile.mkdtemp(prefix="fraud_shards_")
+    shard_paths, buf_X, buf_y, buffered = [], [], [], 0
+    test_X, test_y = [], []
+    baseline = DriftSketch(scaler.mean_, scaler.scale_)
+
+    def flush():
+        nonlocal buf_X, buf_y, buffered
+        if not buffered:
+            return
+        X, y = np.concatenate(buf_X), np.concatenate(buf_y)
+        order = rng.permutation(len(y))
+        path = os.path.join(workdir, f"shard_{len(shard_paths):04d}.npz")
+        np.savez(path, X=X[order], y=y[order])
+        shard_paths.append(path)
+        buf_X, buf_y, buffered = [], [], 0
+
+    try:
+        for X, y in iter_chunks(args.data, args.chunksize):
+            baseline.update(X.to_numpy())
+            X = scaler.transform(X).astype(np.float32)
+            # Hold out an evaluation split before any rebalancing.
+            held_out = rng.random(len(y)) < test_rate
+            test_X.append(X[held_out])
+            test_y.append(y[held_out])
+            X, y = X[~held_out], y[~held_out]
+
+            keep = (y == 1) | (rng.random(len(y)) < keep_legit)
+            buf_X.append(X[keep])
+            buf_y.append(y[keep])
+            buffered += int(keep.sum())
+            if buffered >= shard_rows:
+                flush()
+        flush()
+
+        if args.engine in FOREST_ENGINES:
+            # Spread the requested tree count over the shards, rounding up so every shard contributes.
+            per_shard = max(1, -(-args.n_estimators // len(shard_paths)))
+            print(f"🧠 Training {len(shard_paths)} shard forest(s) x {per_shard} trees on {n_jobs} worker(s)...")
+            forests = Parallel(n_jobs=n_jobs)(
+                delayed(fit_shard)(path, per_shard, args.max_depth, 42 + i)
+                for i, path in enumerate(shard_paths)
+            )
+        else:
+            print(f"🧠 Training one {args.engine} model on {len(shard_paths)} pooled shard(s)...")
+            forests = [fit_pooled(shard_paths, args, shard_rows * n_jobs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    forests = [f for f in forests if f is not None]
+    if not forests:
+        raise SystemExit("❌ No shard contained both classes; raise --max-memory-mb or --neg-ratio.")
+    if args.engine in FOREST_ENGINES:
+        model = merge_forests(forests)
+        print(f"🌲 Merged {model.n_estimators} trees from {len(forests)} shard(s).")
+    else:
+        model = forests[0]
+
+    X_test, y_test = np.concatenate(test_X), np.concatenate(test_y)
+    report(y_test, model.predict(X_test))
+    save_artifacts(model, scaler, baseline)
+
+
+# --- Hyperparameter Search ---
+# Successive halving: every sampled configuration is cross-validated on a small stratified
+# sample of the training split, and the best 1/--factor go on to a sample --factor times
+# larger, until the last round uses the whole split. Each fold is resampled on its training
+# side only, and the held-out test split is never resampled. Every (candidate, round, fold)
+# score is appended to --tune-results as it finishes, so re-running the same search skips
+# the fits it already has.
+def build_model(params, seed=42):
+    params = dict(params)
+    module, cls, fixed = TUNE_MODELS[params.pop("model")]
+    return getattr(importlib.import_module(module), cls)(**fixed, **params, random_state=seed)
+
+
+def resample(X, y, method, neg_ratio, seed=42):
+    if method == "smote":
+        from imblearn.over_sampling import SMOTE
+
+        # Small early-round folds may have fewer fraud rows than SMOTE's default 5 neighbours.
+        k = min(5, int(y.sum()) - 1)
+        return SMOTE(k_neighbors=k, random_state=seed).fit_resample(X, y) if k >= 1 else (X, y)
+    if method == "undersample":
+        rng = np.random.default_rng(seed)
+        legit = np.flatnonzero(y == 0)
+        keep = rng.choice(legit, min(len(legit), int(neg_ratio * y.sum())), replace=False)
+        rows = np.sort(np.concatenate([np.flatnonzero(y == 1), keep]))
+        return X[rows], y[rows]
+    return X, y
+
+
+def score_fold(candidate, fold, params, X, y, train, test, method, neg_ratio):
+    from sklearn.metrics import average_precision_score
+
+    start = time.perf_counter()
+    X_fit, y_fit = resample(X[train], y[train], method, neg_ratio)
+    model = build_model(params).fit(X_fit, y_fit)
+    score = average_precision_score(y[test], model.predict_proba(X[test])[:, 1])
+    return candidate, fold, float(score), time.perf_counter() - start
+
+
+def halving_schedule(n_candidates, n_samples, factor, min_resources):
+    # [(candidates, rows)] per round; the last round uses every row.
+    rounds = 1
+    while factor ** rounds < n_candidates:
+        rounds += 1
+    first = min(max(min_resources, n_samples // factor ** (rounds - 1)), n_samples)
+    schedule, alive = [], n_candidates
+    for i in range(rounds):
+        schedule.append((alive, min(n_samples, first * factor ** i)))
+        alive = max(1, -(-alive // factor))
+    return schedule
+
+
+def search_id(args, spaces, n_train):
+    # Fold scores are only reused by a search over the same data, split and settings.
+    key = json.dumps([os.path.getsize(args.data), os.path.getmtime(args.data), n_train, args.test_size,
+                      args.n_candidates, args.factor, args.cv, args.resample, args.neg_ratio, spaces], default=str)
+    return hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+
+def load_results(path, sid):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    results = pd.read_csv(path, dtype={"search_id": str})
+    return results[results["search_id"] == sid]
+
+
+def train_tune(args):
+    from joblib import Parallel, delayed
+    from sklearn.metrics import average_precision_score
+    from sklearn.model_selection import ParameterSampler, StratifiedKFold
+    from sklearn.utils import resample as subsample
+
+    X_train, X_test, y_train, y_test, scaler, baseline = load_split(args)
+    spaces = [space for space in SEARCH_SPACES if space["model"][0] in args.tune_models]
+    candidates = list(ParameterSampler(spaces, n_iter=args.n_candidates, random_state=42))
+    min_resources = int(MIN_FOLD_FRAUD * args.cv / max(y_train.mean(), 1e-9))
+    schedule = halving_schedule(len(candidates), len(y_train), args.factor, min_resources)
+
+    sid = search_id(args, spaces, len(y_train))
+    done = load_results(args.tune_results, sid)
+    if len(done):
+        print(f"↩️ Resuming search {sid}: {len(done)} fold scores already in {args.tune_results}")
+    os.makedirs(os.path.dirname(args.tune_results) or ".", exist_ok=True)
+
+    alive = list(range(len(candidates)))
+    for rnd, (_, n_resources) in enumerate(schedule):
+        rows = np.arange(len(y_train))
+        if n_resources < len(y_train):
+            rows = subsample(rows, n_samples=n_resources, replace=False, stratify=y_train, random_state=42 + rnd)
+        X, y = X_train[rows], y_train[rows]
+        folds = list(StratifiedKFold(args.cv, shuffle=True, random_state=42 + rnd).split(X, y))
+        finished = set(done.loc[done["round"] == rnd, ["candidate", "fold"]].itertuples(index=False, name=None))
+        tasks = [(c, f) for c in alive for f in range(args.cv) if (c, f) not in finished]
+        print(f"🔎 Round {rnd + 1}/{len(schedule)}: {len(alive)} candidates x {args.cv} folds "
+              f"on {n_resources:,} rows ({len(tasks)} fits to run)")
+
+        with open(args.tune_results, "a", newline="") as f:
+            header = f.tell() == 0
+            results = Parallel(n_jobs=args.n_jobs, return_as="generator_unordered")(
+                delayed(score_fold)(c, fold, candidates[c], X, y, *folds[fold], args.resample, args.neg_ratio)
+                for c, fold in tasks
+            )
+            for c, fold, score, seconds in results:
+                row = pd.DataFrame([[sid, c, rnd, n_resources, fold, candidates[c]["model"],
+                                     json.dumps(candidates[c]), score, seconds]], columns=RESULT_COLUMNS)
+                row.to_csv(f, header=header, index=False)
+                f.flush()
+                header = False
+                done = pd.concat([done, row], ignore_index=True)
+
+        scores = done[done["round"] == rnd].groupby("candidate")["average_precision"].mean()
+        alive = sorted(alive, key=lambda c: -scores[c])
+        for c in alive[:5]:
+            print(f"   #{c:<3} AP {scores[c]:.4f}  {candidates[c]}")
+        if rnd + 1 < len(schedule):
+            alive = alive[:schedule[rnd + 1][0]]
+
+    best = candidates[alive[0]]
+    print(f"🏆 Best configuration: {best}")
+    model = build_model(best)
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = -1
+    X_fit, y_fit = resample(X_train, y_train, args.resample, args.neg_ratio)
+    model.fit(X_fit, y_fit)
+
+    proba = model.predict_proba(X_test)[:, 1]
+    print(f"\n🎯 Held-out average precision: {average_precision_score(y_test, proba):.4f}")
+    report(y_test, (proba >= 0.5).astype(int))
+    save_artifacts(model, scaler, baseline)
 
-X = df.drop('Class', axis=1)
-y = df['Class']
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the fraud detection model.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--engine", choices=list(ENGINES), default=DEFAULT_ENGINE,
+                        help="model family: rf (random forest) or hgb (histogram gradient boosting)")
+    parser.add_argument("--n-estimators", type=int, default=100, help="trees (rf) or boosting rounds (hgb)")
+    parser.add_argument("--max-depth", type=int, default=12)
+    parser.add_argument("--learning-rate", type=float, default=0.1, help="shrinkage per boosting round (hgb)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="out-of-core training: incremental scaler, undersampling, parallel shard forests")
+    parser.add_argument("--chunksize", type=int, default=200_000, help="rows read per chunk in --streaming mode")
+    parser.add_argument("--max-memory-mb", type=int, default=2048, help="peak memory budget for --streaming mode")
+    parser.add_argument("--neg-ratio", type=float, default=5.0, help="legit rows kept per fraud row in --streaming mode")
+    parser.add_argument("--test-size", type=float, default=0.3)
+    parser.add_argument("--max-eval-rows", type=int, default=1_000_000, help="cap on held-out rows in --streaming mode")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--tune", action="store_true",
+                        help="successive-halving search over forest and gradient-boosting configurations")
+    parser.add_argument("--tune-models", nargs="+", choices=list(TUNE_MODELS), default=list(TUNE_MODELS))
+    parser.add_argument("--n-candidates", type=int, default=27, help="configurations sampled in --tune mode")
+    parser.add_argument("--factor", type=int, default=3, help="halving factor in --tune mode")
+    parser.add_argument("--cv", type=int, default=3, help="cross-validation folds in --tune mode")
+    parser.add_argument("--resample", choices=["smote", "undersample", "none"], default="smote",
+                        help="rebalancing of each training fold in --tune mode")
+    parser.add_argument("--tune-results", default=TUNE_RESULTS, help="fold scores table; a re-run resumes from it")
+    parser.add_argument("--register", choices=["candidate", "active"],
+                        help="also register the artifacts as a new model version and point candidate or active at it")
+    args = parser.parse_args(argv)
 
-print("⚖️ Applying SMOTE...")
-smote = SMOTE(random_state=42)
-X_resampled, y_resampled = smote.fit_resample(X_scaled, y)
+    if args.tune:
+        train_tune(args)
+    elif args.streaming:
+        train_streaming(args)
+    else:
+        train_in_memory(args)
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X_resampled, y_resampled, test_size=0.3, random_state=42)
+    if args.register:
+        from registry import ModelRegistry
 
-print("🧠 Training model...")
-model = RandomForestClassifier(n_estimators=100, max_depth=12, n_jobs=-1, random_state=42)
-model.fit(X_train, y_train)
+        registry = ModelRegistry()
+        mode = "tuned" if args.tune else "streaming" if args.streaming else "in-memory"
+        note = mode if args.tune else f"{mode} {args.engine} n_estimators={args.n_estimators} max_depth={args.max_depth}"
+        version = registry.register(note=note)
+        if args.register == "active":
+            registry.promote(version)
+        else:
+            registry.set("candidate", version)
+        print(f"✅ Registered {version} as {args.register}")
 
-y_pred = model.predict(X_test)
-print("\n📊 Classification Report:\n", classification_report(y_test, y_pred))
-print("\n🟦 Confusion Matrix:\n", confusion_matrix(y_test, y_pred))
 
-os.makedirs("model", exist_ok=True)
-joblib.dump(model, "model/fraud_model.pkl")
-joblib.dump(scaler, "model/scaler.pkl")
-print("✅ Model and Scaler saved.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# --- User Store ---
+# Accounts live in one SQLite table keyed by email, shared by every session of every
+# server process. Each signup or rehash is a single INSERT or UPDATE in its own
+# transaction, so concurrent sessions cannot overwrite each other's changes, and a
+# lookup reads one row through the primary-key index.
+USER_DB = "users.db"
+# Accounts from the old users.json are imported while the database is still empty.
+LEGACY_USER_FILE = "users.json"
+# PBKDF2-HMAC-SHA256 rounds for new hashes. Raise this as hardware gets faster; stored
+# hashes keep their own count and are re-hashed at the new cost on the next login.
+KDF_ITERATIONS = int(os.environ.get("FRAUD_KDF_ITERATIONS", 600_000))
+SALT_BYTES = 16
+# Successful logins remembered per process so repeated logins skip the KDF.
+LOGIN_CACHE = 1024
+# Seconds a writer waits for another connection's transaction before giving up.
+BUSY_TIMEOUT = 30
+
+
+def hash_password(password, iterations=KDF_ITERATIONS, salt=None):
+    salt = salt or secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password, stored):
+    # Returns (matches, needs_rehash). Unsalted SHA-256 hashes are the old users.json format.
+    if "$" not in stored:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    _, iterations, salt, digest = stored.split("$")
+    check = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(check.hex(), digest), int(iterations) != KDF_ITERATIONS
+
+
+class UserStore:
+    def __init__(self, path=USER_DB, legacy_path=LEGACY_USER_FILE):
+        self.path = path
+        self.local = threading.local()
+        # Keyed by email: (stored hash, HMAC of the password under a per-process key).
+        # Only valid while the stored hash is unchanged; nothing here outlives the process.
+        self.cache = OrderedDict()
+        self.cache_key = secrets.token_bytes(32)
+        self.lock = threading.Lock()
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS users ("
+                       "email TEXT PRIMARY KEY, password TEXT NOT NULL, created TEXT NOT NULL)")
+        self._import_legacy(legacy_path)
+
+    def _connect(self):
+        # One connection per thread; Streamlit runs each session's script on its own thread.
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def _import_legacy(self, legacy_path):
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        if self._connect().execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            return
+        with open(legacy_path) as f:
+            users = json.load(f)
+        created = datetime.now().isoformat(timespec="seconds")
+        with self._connect() as db:
+            db.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?)",
+                           [(email, stored, created) for email, stored in users.items()])
+
+    def _password(self, email):
+        row = self._connect().execute("SELECT password FROM users WHERE email = ?", (email,)).fetchone()
+        return row[0] if row else None
+
+    def exists(self, email):
+        return self._password(email) is not None
+
+    def create(self, email, password):
+        # False if the email is taken; the primary key makes check-and-insert atomic.
+        try:
+            with self._connect() as db:
+                db.execute("INSERT INTO users VALUES (?, ?, ?)",
+                           (email, hash_password(password), datetime.now().isoformat(timespec="seconds")))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def authenticate(self, email, password):
+        # "ok", "invalid" (wrong password) or "missing" (no such user).
+        stored = self._password(email)
+        if stored is None:
+            return "missing"
+        token = hmac.new(self.cache_key, password.encode(), hashlib.sha256).digest()
+        with self.lock:
+            hit = self.cache.get(email)
+        if hit is not None and hit[0] == stored and hmac.compare_digest(hit[1], token):
+            return "ok"
+
+        matches, needs_rehash = verify_password(password, stored)
+        if not matches:
+            return "invalid"
+        if needs_rehash:
+            new = hash_password(password)
+            with self._connect() as db:
+                # Only replace the hash we verified; a concurrent password change wins.
+                db.execute("UPDATE users SET password = ? WHERE email = ? AND password = ?", (new, email, stored))
+            stored = new
+        with self.lock:
+            self.cache[email] = (stored, token)
+            self.cache.move_to_end(email)
+            while len(self.cache) > LOGIN_CACHE:
+                self.cache.popitem(last=False)
+        return "ok"
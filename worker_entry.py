@@ -0,0 +1,16 @@
+from multiprocessing import spawn
+
+# --- Pool Worker Entry ---
+# Imported once in the forkserver (first in worker_pool.PRELOAD) and never by the app. Every
+# pool worker is forked from the forkserver and then prepared from the parent's data, which
+# names the parent's __main__ for re-import (as __mp_main__). Under Streamlit that is app.py,
+# so each worker would run the whole app. Pool tasks are functions from importable modules
+# and never need the parent's __main__, so workers skip that step.
+
+
+def _keep_main(*_):
+    pass
+
+
+spawn._fixup_main_from_path = _keep_main
+spawn._fixup_main_from_name = _keep_main
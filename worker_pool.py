@@ -0,0 +1,27 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Worker Pools ---
+# Streamlit runs app.py as the __main__ module, and multiprocessing re-imports __main__ in
+# every new worker (as __mp_main__), which would re-run the whole app there. Pools used by
+# the app start workers from a forkserver whose first preloaded module, worker_entry, turns
+# that re-import off; the app process itself is left untouched.
+# Modules imported once in the forkserver; every worker is forked with them loaded.
+PRELOAD = ["worker_entry", "numpy", "pandas", "sklearn.ensemble", "scoring", "parallel_scoring", "explain",
+           "model_compare"]
+# Without a forkserver (Windows) workers are spawned and do re-import __main__; run the app
+# from a platform that has one.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def worker_context():
+    context = multiprocessing.get_context(START_METHOD)
+    if START_METHOD == "forkserver":
+        # One forkserver per process, so every pool shares one preload list.
+        context.set_forkserver_preload(PRELOAD)
+    return context
+
+
+class WorkerPool(ProcessPoolExecutor):
+    def __init__(self, max_workers, **kwargs):
+        super().__init__(max_workers, mp_context=worker_context(), **kwargs)